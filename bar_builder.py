@@ -0,0 +1,139 @@
+class Bar:
+    __slots__ = ("symbol", "candle_ms", "timestamp", "open", "high", "low", "close", "volume", "ticks")
+    
+    def __init__(self, symbol, candle_ms, timestamp_ms, price, volume):
+        """
+        OHLCV bar of the ticks generated from one candle, opened by its first tick.
+        
+        Args:
+            symbol: Symbol the bar belongs to
+            candle_ms: Start time of the source candle, identifying the bar
+            timestamp_ms: Timestamp of the first tick, the bar's start time
+            price: Price of the first tick
+            volume: Volume of the source candle; ticks carry no volume of their own
+        """
+        self.symbol = symbol
+        self.candle_ms = candle_ms
+        self.timestamp = timestamp_ms
+        self.open = price
+        self.high = price
+        self.low = price
+        self.close = price
+        self.volume = volume
+        self.ticks = 1
+    
+    def update(self, price):
+        """Add a tick to the bar."""
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.ticks += 1
+    
+    def to_message(self, complete):
+        """Return the bar as a message dictionary."""
+        return {
+            "type": "bar",
+            "symbol": self.symbol,
+            "timestamp": self.timestamp,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+            "ticks": self.ticks,
+            "complete": complete
+        }
+
+
+class BarKey:
+    __slots__ = ("symbol", "timestamp")
+    
+    def __init__(self, symbol, timestamp=None):
+        """
+        Send queue key of a bar message.
+        
+        Completed bars are keyed by symbol and start time, so conflation never
+        replaces one; in-progress bars share a key per symbol, so a client that
+        falls behind only gets the latest.
+        """
+        self.symbol = symbol
+        self.timestamp = timestamp
+    
+    def __eq__(self, other):
+        return isinstance(other, BarKey) and self.symbol == other.symbol and self.timestamp == other.timestamp
+    
+    def __hash__(self):
+        return hash((BarKey, self.symbol, self.timestamp))
+
+
+def bar_key(message):
+    """Return the send queue key of a bar message."""
+    if message["complete"]:
+        return BarKey(message["symbol"], message["timestamp"])
+    return BarKey(message["symbol"])
+
+
+class BarBuilder:
+    def __init__(self, partial_interval_ms=None):
+        """
+        Build OHLCV bars incrementally from the ticks of any number of symbols.
+        
+        A bar collects the ticks generated from one candle. It is completed when
+        the first tick of the next candle arrives, or by finish() when the data
+        runs out, so bars go out at candle boundaries without the client having
+        to rebuild them from every tick.
+        
+        Args:
+            partial_interval_ms: Also emit the bar in progress, at most once per
+                this many ms of tick time per symbol; 0 emits it on every tick and
+                None only emits completed bars
+        """
+        self.partial_interval_ms = partial_interval_ms
+        self._bars = {}
+        self._partial_at = {}
+    
+    def add_tick(self, symbol, timestamp_ms, price, candle_ms, volume=0.0):
+        """
+        Add a tick generated from the candle starting at candle_ms.
+        
+        Returns:
+            List of bar messages to send: the previous bar if this tick completed
+            it, and the bar in progress when a partial update is due
+        """
+        messages = []
+        bar = self._bars.get(symbol)
+        if bar is not None and bar.candle_ms != candle_ms:
+            messages.append(bar.to_message(True))
+            bar = None
+        
+        if bar is None:
+            bar = Bar(symbol, candle_ms, timestamp_ms, price, volume)
+            self._bars[symbol] = bar
+            self._partial_at.pop(symbol, None)
+        else:
+            bar.update(price)
+        
+        if self.partial_interval_ms is not None:
+            last = self._partial_at.get(symbol)
+            if last is None or timestamp_ms - last >= self.partial_interval_ms:
+                self._partial_at[symbol] = timestamp_ms
+                messages.append(bar.to_message(False))
+        
+        return messages
+    
+    def finish(self, symbol):
+        """Complete a symbol's bar in progress; returns its message, or None if there is none."""
+        self._partial_at.pop(symbol, None)
+        bar = self._bars.pop(symbol, None)
+        return bar.to_message(True) if bar is not None else None
+    
+    def finish_all(self):
+        """Complete every bar in progress and return their messages."""
+        return [message for message in map(self.finish, list(self._bars)) if message is not None]
+    
+    def discard(self, symbol):
+        """Drop a symbol's bar in progress without sending it, e.g. when it is unsubscribed."""
+        self._bars.pop(symbol, None)
+        self._partial_at.pop(symbol, None)
@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+from candle_cache import CandleCache
+from candle_file import write_candle_file
+from candle_store import CandleStore
+from correlated_paths import CorrelatedPaths
+from data_loader import DataLoader
+from replay import iter_generator_ticks
+from response_formatter import ResponseFormatter
+from serializers import JSON_BACKEND
+from tick_generator import TickGenerator
+from tick_tape import TapeWriter, TickTape
+
+
+NESTED_TEMPLATE = {
+    "NSE": {
+        "CASH": {
+            "{{SYMBOL}}": {
+                "tsInMillis": "{{TIMESTAMP}}",
+                "value": "{{TICK}}"
+            }
+        }
+    }
+}
+
+
+def synthetic_candles(count, start_price=50000.0, interval_ms=60000, seed=0):
+    """Build a CandleStore of random-walk candles, so benchmarks need no data dir."""
+    rng = np.random.default_rng(seed)
+    close = start_price + np.cumsum(rng.normal(0, 15, count))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    high = np.maximum(open_, close) + rng.uniform(0, 10, count)
+    low = np.minimum(open_, close) - rng.uniform(0, 10, count)
+    timestamp = 1751427900000 + np.arange(count, dtype=np.int64) * interval_ms
+    volume = rng.integers(0, 1000, count).astype(np.float64)
+    return CandleStore(timestamp, open_, high, low, close, volume)
+
+
+def write_json_candles(file_path, candles):
+    """Write candles as a JSON data file in the format the loader reads."""
+    records = [
+        {
+            "timestamp": datetime.fromtimestamp(int(candles.timestamp[i]) / 1000.0).strftime("%Y-%m-%d %H:%M:%S"),
+            "open": float(candles.open[i]),
+            "high": float(candles.high[i]),
+            "low": float(candles.low[i]),
+            "close": float(candles.close[i]),
+            "volume": float(candles.volume[i])
+        }
+        for i in range(len(candles))
+    ]
+    with open(file_path, "w") as f:
+        json.dump(records, f)
+
+
+def environment():
+    """Describe the code version and platform results were measured on, for comparing runs."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    
+    return {
+        "commit": commit,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "json_backend": JSON_BACKEND,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def write_results(path, name, args, results):
+    """Write results with the environment and arguments as JSON, to a file or to stdout for "-"."""
+    document = {
+        "suite": name,
+        "environment": environment(),
+        "args": {key: value for key, value in vars(args).items() if key != "json"},
+        "results": results
+    }
+    text = json.dumps(document, indent=2) + "\n"
+    if path == "-":
+        sys.stdout.write(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text)
+        print(f"Results written to {path}", file=sys.stderr)
+
+
+def best_of(func, repeat):
+    """Run func repeat times and return the fastest wall time in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_tick_paths(candles, ticks_per_candle, batch_size, repeat):
+    """Time generating tick paths for every candle, per candle and in batches."""
+    def per_candle():
+        generator = TickGenerator(candles, ticks_per_candle, seed=1)
+        while generator.advance_candle():
+            pass
+    
+    def batched():
+        generator = TickGenerator(candles, ticks_per_candle, batch_size=batch_size, seed=1)
+        while generator.advance_candle():
+            pass
+    
+    return best_of(per_candle, repeat), best_of(batched, repeat)
+
+
+def bench_correlated(candles, ticks_per_candle, symbols, batch_size, repeat):
+    """Time generating tick paths for several symbols candle by candle, independently and from one underlying path."""
+    def run(paths):
+        generators = [TickGenerator(candles, ticks_per_candle, batch_size=batch_size, seed=i, paths=paths)
+                      for i in range(symbols)]
+        for _ in range(len(candles) - 1):
+            for generator in generators:
+                generator.advance_candle()
+    
+    def independent():
+        run(None)
+    
+    def correlated():
+        run(CorrelatedPaths(candles, seed=0, block_size=batch_size))
+    
+    return best_of(independent, repeat), best_of(correlated, repeat)
+
+
+def bench_tick_sequence(candles, ticks_per_candle, count, repeat):
+    """Time count calls of TickGenerator._generate_tick_sequence on the first candle."""
+    generator = TickGenerator(candles, ticks_per_candle, seed=1)
+    
+    def generate():
+        for _ in range(count):
+            generator._generate_tick_sequence()
+    
+    return best_of(generate, repeat)
+
+
+def bench_loader(candles, repeat):
+    """
+    Time DataLoader on the same candles stored as a JSON file and as a binary file.
+    
+    Returns:
+        List of (case, seconds) pairs
+    """
+    middle_ms = int(candles.timestamp[len(candles) // 2])
+    
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_json_candles(os.path.join(data_dir, "BENCHJSON_1m.json"), candles)
+        write_candle_file(os.path.join(data_dir, "BENCHBIN_1m.bin"), candles)
+        
+        def cold_load(symbol):
+            return lambda: DataLoader(data_dir, cache=CandleCache()).load_symbol_data(symbol)
+        
+        def first_chunk(symbol, start_ms=None):
+            return lambda: next(iter(DataLoader(data_dir, cache=CandleCache()).stream_symbol_data(
+                symbol, prefetch=False, start_ms=start_ms)))
+        
+        warm_loader = DataLoader(data_dir, cache=CandleCache())
+        warm_loader.load_symbol_data("BENCHJSON")
+        warm_candles = warm_loader.load_symbol_data("BENCHBIN")
+        
+        return [
+            ("json load", best_of(cold_load("BENCHJSON"), repeat)),
+            ("binary load", best_of(cold_load("BENCHBIN"), repeat)),
+            ("cached load", best_of(lambda: warm_loader.load_symbol_data("BENCHJSON"), repeat)),
+            ("resample to 5m", best_of(lambda: warm_candles.resample(300000), repeat)),
+            ("cached 5m load", best_of(lambda: warm_loader.load_symbol_data("BENCHJSON", "5m"), repeat)),
+            ("json first chunk", best_of(first_chunk("BENCHJSON"), repeat)),
+            ("binary first chunk", best_of(first_chunk("BENCHBIN"), repeat)),
+            ("binary seek to middle", best_of(first_chunk("BENCHBIN", middle_ms), repeat))
+        ]
+
+
+def bench_tape(candles, ticks_per_candle, repeat):
+    """
+    Time replaying ticks by generating them against playing them from recorded tapes.
+    
+    Returns:
+        List of (case, seconds, file size in bytes or None) tuples
+    """
+    def replay_ticks():
+        generator = TickGenerator(candles, ticks_per_candle, seed=0, replay=True)
+        return iter_generator_ticks("BENCH", generator)
+    
+    with tempfile.TemporaryDirectory() as tape_dir:
+        results = [("generate", best_of(lambda: deque(replay_ticks(), maxlen=0), repeat), None)]
+        for case, compress in (("tape", False), ("compressed tape", True)):
+            file_path = os.path.join(tape_dir, f"{case}.tape")
+            with TapeWriter(file_path, {"symbol": "BENCH"}, compress) as writer:
+                writer.extend((timestamp_ms, price) for _, timestamp_ms, price in replay_ticks())
+            elapsed = best_of(lambda: deque(TickTape(file_path).iter_ticks(), maxlen=0), repeat)
+            results.append((case, elapsed, os.path.getsize(file_path)))
+        return results
+
+
+def bench_formatter(template, count, repeat):
+    """Time formatting count ticks with the compiled plan and with copy-and-replace."""
+    formatter = ResponseFormatter(template)
+    prices = [50000.0 + i * 0.05 for i in range(count)]
+    
+    def compiled():
+        for i, price in enumerate(prices):
+            formatter.format_response("BANKNIFTY", 1751427900000 + i, price)
+    
+    def uncompiled():
+        for i, price in enumerate(prices):
+            formatter._format_uncompiled("BANKNIFTY", 1751427900000 + i, price)
+    
+    return best_of(uncompiled, repeat), best_of(compiled, repeat)
+
+
+def run_tick_path_benchmarks(args):
+    candles = synthetic_candles(args.candles)
+    results = []
+    
+    print(f"{'ticks/candle':>12} {'per-candle':>12} {'batch':>12} {'speedup':>8} {'Mticks/s':>9}")
+    for ticks_per_candle in args.ticks:
+        per_candle, batched = bench_tick_paths(candles, ticks_per_candle, args.batch_size, args.repeat)
+        total_ticks = args.candles * ticks_per_candle
+        print(f"{ticks_per_candle:>12} {per_candle * 1000:>10.1f}ms {batched * 1000:>10.1f}ms "
+              f"{per_candle / batched:>7.1f}x {total_ticks / batched / 1e6:>9.2f}")
+        results.append({
+            "ticks_per_candle": ticks_per_candle,
+            "per_candle_seconds": per_candle,
+            "batch_seconds": batched,
+            "batch_ticks_per_second": total_ticks / batched
+        })
+    return results
+
+
+def run_correlated_benchmarks(args):
+    candles = synthetic_candles(args.candles)
+    results = []
+    
+    print(f"{'ticks/candle':>12} {'independent':>12} {'correlated':>12} {'speedup':>8} {'Mticks/s':>9}")
+    for ticks_per_candle in args.ticks:
+        independent, correlated = bench_correlated(candles, ticks_per_candle, args.correlated_symbols,
+                                                   args.correlated_batch, args.repeat)
+        total_ticks = args.candles * ticks_per_candle * args.correlated_symbols
+        print(f"{ticks_per_candle:>12} {independent * 1000:>10.1f}ms {correlated * 1000:>10.1f}ms "
+              f"{independent / correlated:>7.1f}x {total_ticks / correlated / 1e6:>9.2f}")
+        results.append({
+            "ticks_per_candle": ticks_per_candle,
+            "symbols": args.correlated_symbols,
+            "independent_seconds": independent,
+            "correlated_seconds": correlated,
+            "correlated_ticks_per_second": total_ticks / correlated
+        })
+    return results
+
+
+def run_tick_sequence_benchmarks(args):
+    candles = synthetic_candles(2)
+    results = []
+    
+    print(f"{'ticks/candle':>12} {'total':>12} {'us/call':>9} {'Mticks/s':>9}")
+    for ticks_per_candle in args.ticks:
+        elapsed = bench_tick_sequence(candles, ticks_per_candle, args.sequence_count, args.repeat)
+        per_call = elapsed / args.sequence_count
+        print(f"{ticks_per_candle:>12} {elapsed * 1000:>10.1f}ms {per_call * 1e6:>9.2f} "
+              f"{ticks_per_candle / per_call / 1e6:>9.2f}")
+        results.append({
+            "ticks_per_candle": ticks_per_candle,
+            "seconds_per_call": per_call,
+            "ticks_per_second": ticks_per_candle / per_call
+        })
+    return results
+
+
+def run_formatter_benchmarks(args):
+    results = []
+    
+    print(f"{'template':>12} {'uncompiled':>12} {'compiled':>12} {'speedup':>8} {'us/tick':>9}")
+    for name, template in (("default", None), ("nested", NESTED_TEMPLATE)):
+        uncompiled, compiled = bench_formatter(template, args.format_count, args.repeat)
+        print(f"{name:>12} {uncompiled * 1000:>10.1f}ms {compiled * 1000:>10.1f}ms "
+              f"{uncompiled / compiled:>7.1f}x {compiled / args.format_count * 1e6:>9.2f}")
+        results.append({
+            "template": name,
+            "uncompiled_seconds": uncompiled,
+            "compiled_seconds": compiled,
+            "seconds_per_tick": compiled / args.format_count
+        })
+    return results
+
+
+def run_loader_benchmarks(args):
+    candles = synthetic_candles(args.loader_candles)
+    results = []
+    
+    print(f"{'case':>22} {'time':>12} {'Mcandles/s':>11}")
+    for case, elapsed in bench_loader(candles, args.repeat):
+        print(f"{case:>22} {elapsed * 1000:>10.2f}ms {len(candles) / elapsed / 1e6:>11.2f}")
+        results.append({"case": case, "candles": len(candles), "seconds": elapsed})
+    return results
+
+
+def run_tape_benchmarks(args):
+    candles = synthetic_candles(args.candles)
+    total_ticks = args.candles * args.tape_ticks
+    results = []
+    
+    print(f"{'case':>16} {'time':>12} {'Mticks/s':>9} {'size':>10}")
+    for case, elapsed, size in bench_tape(candles, args.tape_ticks, args.repeat):
+        size_text = f"{size / 1024:.0f} KiB" if size is not None else "-"
+        print(f"{case:>16} {elapsed * 1000:>10.1f}ms {total_ticks / elapsed / 1e6:>9.2f} {size_text:>10}")
+        results.append({"case": case, "ticks": total_ticks, "seconds": elapsed, "bytes": size})
+    return results
+
+
+BENCHMARKS = {
+    "ticks": run_tick_path_benchmarks,
+    "correlated": run_correlated_benchmarks,
+    "sequence": run_tick_sequence_benchmarks,
+    "formatter": run_formatter_benchmarks,
+    "loader": run_loader_benchmarks,
+    "tape": run_tape_benchmarks,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark tick generation, response formatting, data loading and tape playback.")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--candles", type=int, default=375, help="Candles per run (375 = one 1m session)")
+    parser.add_argument("--ticks", type=int, nargs="+", default=[60, 600, 6000],
+                        help="Ticks per candle to benchmark (6000 = 10ms ticks on 1m candles)")
+    parser.add_argument("--batch-size", type=int, default=375, help="Candles per vectorized batch")
+    parser.add_argument("--correlated-symbols", type=int, default=13,
+                        help="Symbols in the correlated benchmark (13 = an index and a dozen option strikes)")
+    parser.add_argument("--correlated-batch", type=int, default=64,
+                        help="Candles per vectorized batch in the correlated benchmark")
+    parser.add_argument("--sequence-count", type=int, default=200, help="Tick sequences generated per sequence run")
+    parser.add_argument("--format-count", type=int, default=100000, help="Ticks formatted per formatter run")
+    parser.add_argument("--loader-candles", type=int, default=7500,
+                        help="Candles in the loader benchmark files (7500 = twenty 1m sessions)")
+    parser.add_argument("--tape-ticks", type=int, default=600, help="Ticks per candle in the tape benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, best time is reported")
+    parser.add_argument("--json", metavar="PATH", default=None,
+                        help="Also write machine-readable results to PATH ('-' for stdout)")
+    args = parser.parse_args()
+    
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    
+    results = {}
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"== {name}", file=sys.stderr if args.json == "-" else sys.stdout)
+        results[name] = BENCHMARKS[name](args)
+    
+    if args.json:
+        write_results(args.json, "benchmark", args, results)
+
+
+if __name__ == "__main__":
+    main()
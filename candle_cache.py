@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CandleCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Process-wide LRU cache of loaded candles, bounded by total size in bytes.
+        
+        Args:
+            max_bytes: Upper bound on the estimated size of all cached entries
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, signature):
+        """Return cached candles for key if the stored file signature still matches."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def contains(self, key, signature):
+        """Check whether candles for key and signature are cached, without counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] == signature
+    
+    def put(self, key, signature, candles):
+        """Store candles under key, evicting least recently used entries to stay in budget."""
+        size = estimate_size(candles)
+        
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            
+            self._entries[key] = (signature, candles, size)
+            self.current_bytes += size
+            
+            while self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._discard(oldest_key)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+    
+    def stats(self):
+        """Return cache counters and occupancy."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+    
+    def _discard(self, key):
+        """Remove key from the cache if present. Caller must hold the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[2]
+
+
+def estimate_size(candles):
+    """Estimate the in-memory size of cached candles in bytes."""
+    return candles.nbytes
+
+
+default_cache = CandleCache()
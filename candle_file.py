@@ -0,0 +1,96 @@
+import mmap
+import os
+import struct
+import numpy as np
+from candle_store import CandleStore
+
+
+BINARY_EXTENSION = ".bin"
+MAGIC = b"STKC"
+VERSION = 1
+
+# magic, version, header size, row count, reserved. 32 bytes keeps every
+# column that follows 8-byte aligned.
+HEADER_FORMAT = "<4sHHQ16x"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+COLUMNS = (("timestamp", np.int64),) + tuple((name, np.float64) for name in CandleStore.PRICE_COLUMNS)
+
+
+class CandleFileError(Exception):
+    """Raised when a binary candle file is malformed."""
+
+
+def write_candle_file(file_path, store):
+    """
+    Write a CandleStore to a binary candle file.
+    
+    Layout is a fixed header followed by the packed columns in order:
+    timestamp (int64 epoch ms), open, high, low, close, volume (float64),
+    all little-endian. The file is written to a temporary path and renamed
+    into place so readers never see a partial file.
+    """
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, HEADER_SIZE, len(store)))
+        for name, dtype in COLUMNS:
+            f.write(np.ascontiguousarray(getattr(store, name), dtype=np.dtype(dtype).newbyteorder("<")).tobytes())
+    os.replace(tmp_path, file_path)
+
+
+def candle_buffer_size(row_count):
+    """Size in bytes of a binary candle buffer holding row_count candles."""
+    return HEADER_SIZE + row_count * 8 * len(COLUMNS)
+
+
+def write_candle_buffer(buffer, store):
+    """Write a CandleStore in the binary candle layout into a writable buffer, e.g. shared memory."""
+    struct.pack_into(HEADER_FORMAT, buffer, 0, MAGIC, VERSION, HEADER_SIZE, len(store))
+    
+    offset = HEADER_SIZE
+    for name, dtype in COLUMNS:
+        column = np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder("<"), count=len(store), offset=offset)
+        column[:] = getattr(store, name)
+        offset += len(store) * 8
+
+
+def read_candle_header(buffer):
+    """Parse and validate the header, returning (header_size, row_count)."""
+    if len(buffer) < HEADER_SIZE:
+        raise CandleFileError("File too small for candle header")
+    
+    magic, version, header_size, row_count = struct.unpack_from(HEADER_FORMAT, buffer, 0)
+    if magic != MAGIC:
+        raise CandleFileError("Bad magic, not a candle file")
+    if version != VERSION:
+        raise CandleFileError(f"Unsupported candle file version {version}")
+    
+    expected_size = header_size + row_count * 8 * len(COLUMNS)
+    if len(buffer) < expected_size:
+        raise CandleFileError(f"Truncated candle file: expected {expected_size} bytes, got {len(buffer)}")
+    
+    return header_size, row_count
+
+
+def read_candle_file(file_path):
+    """Memory-map a binary candle file and return a zero-copy CandleStore over it."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise CandleFileError("Empty candle file")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    return store_from_buffer(buffer)
+
+
+def store_from_buffer(buffer):
+    """Build a CandleStore viewing the columns of a binary candle buffer."""
+    header_size, row_count = read_candle_header(buffer)
+    
+    columns = {}
+    offset = header_size
+    for name, dtype in COLUMNS:
+        columns[name] = np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder("<"),
+                                      count=row_count, offset=offset)
+        offset += row_count * 8
+    
+    return CandleStore(**columns)
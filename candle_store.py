@@ -0,0 +1,165 @@
+import numpy as np
+from dateutil import parser
+
+
+def parse_timestamp_ms(value):
+    """
+    Convert a timestamp to epoch milliseconds.
+    
+    Args:
+        value: Epoch milliseconds as a number, or a date string in any format
+            dateutil understands, e.g. "2025-07-02 14:30:00 IST" as found in the
+            JSON files
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        return int(parser.parse(value).timestamp() * 1000)
+    raise ValueError(f"Invalid timestamp: {value!r}")
+
+
+TIMEFRAME_UNITS_MS = {"m": 60000, "h": 3600000, "d": 86400000}
+
+
+def parse_timeframe(value):
+    """
+    Convert a candle timeframe to milliseconds.
+    
+    Args:
+        value: A count and a unit of m, h or d, e.g. "1m", "5m", "15m" or "1h"
+    """
+    if isinstance(value, str) and value[-1:] in TIMEFRAME_UNITS_MS and value[:-1].isdigit():
+        count = int(value[:-1])
+        if count > 0:
+            return count * TIMEFRAME_UNITS_MS[value[-1]]
+    raise ValueError(f"Invalid timeframe: {value!r}")
+
+
+class CandleStore:
+    PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+    
+    def __init__(self, timestamp, open, high, low, close, volume):
+        """
+        Columnar, read-only candle storage.
+        
+        Args:
+            timestamp: Candle start times as epoch milliseconds (int64)
+            open, high, low, close, volume: Candle values (float64)
+        
+        The columns are marked read-only so a single store can be shared by
+        any number of tick generators.
+        """
+        self.timestamp = self._freeze(timestamp, np.int64)
+        self.open = self._freeze(open, np.float64)
+        self.high = self._freeze(high, np.float64)
+        self.low = self._freeze(low, np.float64)
+        self.close = self._freeze(close, np.float64)
+        self.volume = self._freeze(volume, np.float64)
+    
+    @staticmethod
+    def _freeze(values, dtype):
+        """Return values as a contiguous, non-writeable array of the given dtype."""
+        array = np.ascontiguousarray(values, dtype=dtype)
+        array.setflags(write=False)
+        return array
+    
+    @classmethod
+    def empty(cls):
+        """Create a store with no candles."""
+        return cls([], [], [], [], [], [])
+    
+    @classmethod
+    def from_records(cls, records):
+        """Build a store from a list of candle dictionaries as found in the JSON files."""
+        count = len(records)
+        timestamp = np.zeros(count, dtype=np.int64)
+        columns = {name: np.zeros(count, dtype=np.float64) for name in cls.PRICE_COLUMNS}
+        
+        for i, record in enumerate(records):
+            if 'timestamp' in record:
+                timestamp[i] = parse_timestamp_ms(record['timestamp'])
+            for name, column in columns.items():
+                column[i] = record.get(name, 0)
+        
+        return cls(timestamp, **columns)
+    
+    @classmethod
+    def concat(cls, stores):
+        """Chain several stores end to end, e.g. consecutive option expiries."""
+        stores = [store for store in stores if len(store)]
+        if not stores:
+            return cls.empty()
+        if len(stores) == 1:
+            return stores[0]
+        
+        return cls(
+            np.concatenate([store.timestamp for store in stores]),
+            **{name: np.concatenate([getattr(store, name) for store in stores])
+               for name in cls.PRICE_COLUMNS}
+        )
+    
+    def __reduce__(self):
+        # Rebuild through __init__ so the columns come back read-only, e.g. from a preload process.
+        return (CandleStore, (self.timestamp, *(getattr(self, name) for name in self.PRICE_COLUMNS)))
+    
+    def __len__(self):
+        return len(self.timestamp)
+    
+    @property
+    def nbytes(self):
+        """Total size of the column buffers in bytes."""
+        return self.timestamp.nbytes + sum(getattr(self, name).nbytes for name in self.PRICE_COLUMNS)
+    
+    def candle(self, index):
+        """Return a single candle as a dictionary of plain Python values."""
+        result = {"timestamp": int(self.timestamp[index])}
+        for name in self.PRICE_COLUMNS:
+            result[name] = float(getattr(self, name)[index])
+        return result
+    
+    def slice(self, start, stop=None):
+        """Return a store viewing candles [start, stop) without copying."""
+        return CandleStore(
+            self.timestamp[start:stop],
+            **{name: getattr(self, name)[start:stop] for name in self.PRICE_COLUMNS}
+        )
+    
+    def between(self, start_ms=None, end_ms=None):
+        """
+        Return a view of the candles starting in [start_ms, end_ms], found by binary search.
+        
+        Timestamps must be in ascending order, as they are within a data file.
+        Only the searched timestamps are read, so seeking in a memory-mapped
+        store does not page in the candles that are skipped.
+        """
+        start = 0 if start_ms is None else int(np.searchsorted(self.timestamp, start_ms, side="left"))
+        stop = len(self) if end_ms is None else int(np.searchsorted(self.timestamp, end_ms, side="right"))
+        return self.slice(start, max(start, stop))
+    
+    def resample(self, interval_ms):
+        """
+        Aggregate the candles into coarser candles of interval_ms, e.g. 1m into 5m.
+        
+        Candles are grouped by their start time rounded down to a multiple of
+        interval_ms since the epoch. Each run of candles in the same group
+        becomes one candle with the first open, highest high, lowest low, last
+        close and summed volume, computed for all groups at once with
+        ufunc.reduceat. Returns the store itself when no candles are merged.
+        """
+        if not len(self):
+            return self
+        
+        buckets = self.timestamp - self.timestamp % interval_ms
+        starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+        if len(starts) == len(self) and np.array_equal(buckets, self.timestamp):
+            return self
+        
+        ends = np.append(starts[1:], len(self)) - 1
+        return CandleStore(
+            buckets[starts],
+            open=self.open[starts],
+            high=np.maximum.reduceat(self.high, starts),
+            low=np.minimum.reduceat(self.low, starts),
+            close=self.close[ends],
+            volume=np.add.reduceat(self.volume, starts)
+        )
@@ -0,0 +1,152 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from candle_store import CandleStore
+
+
+DEFAULT_CHUNK_CANDLES = 4096
+PREFETCH_WORKERS = 4
+
+_END = object()
+_prefetch_executor = None
+
+
+def prefetch_executor():
+    """Return the thread pool shared by every prefetching candle stream in this process."""
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        _prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="candle-prefetch")
+    return _prefetch_executor
+
+
+class PrefetchIterator:
+    def __init__(self, iterable, executor=None):
+        """
+        Iterator that loads its next item in a background thread.
+        
+        While the current item is being consumed, the next one (the next chunk
+        or expiry file) is already being read on the prefetch thread pool. At
+        most one item is loaded ahead, so memory stays bounded.
+        
+        Args:
+            iterable: Source of items, advanced only from one thread at a time
+            executor: Executor to prefetch on; the shared pool when not given
+        """
+        self._iterator = iter(iterable)
+        self._executor = executor or prefetch_executor()
+        self._pending = self._executor.submit(next, self._iterator, _END)
+    
+    def __iter__(self):
+        return self
+    
+    def pending_load(self):
+        """Return the future loading the next item, or None once the source is finished."""
+        return self._pending
+    
+    def __next__(self):
+        if self._pending is None:
+            raise StopIteration
+        
+        try:
+            item = self._pending.result()
+        except Exception:
+            self._pending = None
+            raise
+        
+        if item is _END:
+            self._pending = None
+            raise StopIteration
+        
+        self._pending = self._executor.submit(next, self._iterator, _END)
+        return item
+
+
+class CandleWindow:
+    def __init__(self, chunks):
+        """
+        Forward-only cursor over candles that arrive in chunks.
+        
+        Chunks are pulled from the source only when a candle beyond the loaded
+        ones is needed, and the owner releases chunks it has moved past, so
+        only a window around the current position is held.
+        
+        Args:
+            chunks: A CandleStore, or an iterable of CandleStore chunks in
+                playback order (e.g. DataLoader.stream_symbol_data)
+        """
+        if isinstance(chunks, CandleStore):
+            chunks = [chunks]
+        self._source = iter(chunks)
+        self._chunks = deque()
+        self._end = 0
+        self.exhausted = False
+    
+    def has(self, index):
+        """Check whether candle index exists, loading chunks up to it if needed."""
+        return index < self._end or self._fill(index + 1) > index
+    
+    def locate(self, index):
+        """Return (store, offset) holding candle index, which must exist (see has)."""
+        self._fill(index + 1)
+        for start, store in self._chunks:
+            if start <= index < start + len(store):
+                return store, index - start
+        raise IndexError(f"Candle {index} is not in the window")
+    
+    def timestamp(self, index):
+        """Return the epoch-ms start time of candle index, or None if there is no such candle."""
+        if not self.has(index):
+            return None
+        store, offset = self.locate(index)
+        return int(store.timestamp[offset])
+    
+    def view(self, index, count=1):
+        """
+        Return candles [index, index + count) as a CandleStore, fewer at the end of the data.
+        
+        The result views the chunk without copying unless it spans two chunks.
+        """
+        self._fill(index + count)
+        
+        pieces = []
+        stop = index + count
+        for start, store in self._chunks:
+            end = start + len(store)
+            if end <= index:
+                continue
+            if start >= stop:
+                break
+            pieces.append(store.slice(max(index, start) - start, min(stop, end) - start))
+        
+        return CandleStore.concat(pieces)
+    
+    def _fill(self, end):
+        """Pull chunks until candles before end are loaded or the source runs out; returns the loaded end."""
+        while self._end < end and not self.exhausted:
+            chunk = next(self._source, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            if len(chunk):
+                self._chunks.append((self._end, chunk))
+                self._end += len(chunk)
+        return self._end
+    
+    def pending_load(self, end):
+        """
+        Return the future of a chunk load that reading candles before end would wait on, or None.
+        
+        Chunks that have already arrived are taken in first, so once the returned
+        future is done, reading up to end does not block. Sources other than a
+        PrefetchIterator are read directly and never reported as pending.
+        """
+        while self._end < end and not self.exhausted and isinstance(self._source, PrefetchIterator):
+            future = self._source.pending_load()
+            if future is not None and not future.done():
+                return future
+            self._fill(self._end + 1)
+        return None
+    
+    def release(self, index):
+        """Drop chunks that end before candle index; earlier candles can no longer be read."""
+        while self._chunks and self._chunks[0][0] + len(self._chunks[0][1]) <= index:
+            self._chunks.popleft()
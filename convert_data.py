@@ -0,0 +1,64 @@
+import argparse
+import glob
+import json
+import os
+import time
+from candle_store import CandleStore
+from candle_file import BINARY_EXTENSION, write_candle_file
+
+
+def convert_file(json_path, force=False):
+    """
+    Convert one JSON candle file to the binary format next to it.
+    
+    Returns the binary file path, or None if it was already up to date.
+    """
+    binary_path = os.path.splitext(json_path)[0] + BINARY_EXTENSION
+    if not force and os.path.exists(binary_path):
+        if os.stat(binary_path).st_mtime_ns >= os.stat(json_path).st_mtime_ns:
+            return None
+    
+    with open(json_path, 'r') as f:
+        store = CandleStore.from_records(json.load(f))
+    
+    write_candle_file(binary_path, store)
+    return binary_path
+
+
+def main():
+    """
+    Convert SYMBOL_TIMEFRAME.json and OPT_SYMBOL_EXPIRY_TIMEFRAME.json files
+    into binary candle files that the loader memory-maps.
+    """
+    parser = argparse.ArgumentParser(description="Convert JSON candle files to the binary candle format.")
+    parser.add_argument("files", nargs="*", help="JSON files to convert (default: every *_*.json in the data dir)")
+    parser.add_argument("--data-dir", default="data", help="Data directory to scan when no files are given")
+    parser.add_argument("--force", action="store_true", help="Rewrite binary files even if they are up to date")
+    args = parser.parse_args()
+    
+    files = args.files or sorted(glob.glob(os.path.join(args.data_dir, "*_*.json")))
+    if not files:
+        print("No JSON candle files found")
+        return
+    
+    converted = 0
+    for json_path in files:
+        start = time.perf_counter()
+        try:
+            binary_path = convert_file(json_path, args.force)
+        except Exception as e:
+            print(f"Error converting {json_path}: {e}")
+            continue
+        
+        if binary_path is None:
+            print(f"Skipped {json_path} (up to date)")
+        else:
+            converted += 1
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"Converted {json_path} -> {binary_path} ({elapsed_ms:.1f} ms)")
+    
+    print(f"Converted {converted} of {len(files)} files")
+
+
+if __name__ == "__main__":
+    main()
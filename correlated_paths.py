@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from candle_stream import CandleWindow
+from tick_paths import generate_tick_paths, derive_tick_paths
+
+
+# Underlying candles simulated together in one vectorized pass.
+DEFAULT_BLOCK_CANDLES = 64
+
+# Underlying candles kept for members that are behind the furthest one.
+MAX_CACHED_CANDLES = 4096
+
+# Upper bound on the ticks of cached underlying paths (8 bytes each).
+MAX_CACHED_TICKS = 2000000
+
+
+class CorrelatedPaths:
+    def __init__(self, candles, seed=None, block_size=DEFAULT_BLOCK_CANDLES):
+        """
+        Intra-candle path of an underlying shared by the tick generators of related symbols.
+        
+        The underlying's tick path for a candle is simulated once, the first time
+        any member generator asks for that candle time, and kept for the others.
+        Every member's paths are derived from it in one vectorized pass (see
+        derive_tick_paths), so an index and a dozen of its option strikes tick
+        together at about the cost of one simulation. Members are matched to the
+        underlying by candle start time; a member that moves against the
+        underlying over a block of candles, such as a put, is mirrored. Candles
+        without an underlying candle at the same time, or with a flat one, get
+        independent paths.
+        
+        One client's generators share an instance, and may call it from
+        different threads.
+        
+        Args:
+            candles: The underlying's CandleStore or iterable of chunks, as for TickGenerator
+            seed: Seed for the underlying's price noise
+            block_size: Candles a member generates paths for at a time
+        """
+        self.block_size = block_size
+        self._window = CandleWindow(candles)
+        self._next_index = 0
+        self._candles = OrderedDict()
+        self._paths = OrderedDict()
+        self._path_ticks = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+    
+    def generate(self, candles, ticks_per_candle, rng=None):
+        """
+        Return tick paths for a block of a member's candles.
+        
+        Args:
+            candles: CandleStore block of the member's candles
+            ticks_per_candle: Number of ticks in each path
+            rng: The member's numpy Generator, used for the candles that get independent paths
+        
+        Returns:
+            float64 array of shape (len(candles), ticks_per_candle), rounded to 2 decimals
+        """
+        timestamps = candles.timestamp.tolist()
+        with self._lock:
+            if timestamps:
+                self._read_until(timestamps[-1])
+            self._simulate(timestamps, ticks_per_candle)
+            base_paths = [self._paths.get((timestamp_ms, ticks_per_candle)) for timestamp_ms in timestamps]
+            base_candles = [self._candles.get(timestamp_ms) for timestamp_ms in timestamps]
+            self._evict()
+        
+        paths = np.empty((len(timestamps), ticks_per_candle), dtype=np.float64)
+        aligned = np.array([path is not None for path in base_paths], dtype=bool)
+        
+        if aligned.any():
+            rows = np.flatnonzero(aligned)
+            base = np.array([base_candles[row] for row in rows])
+            open_prices = candles.open[rows]
+            close_prices = candles.close[rows]
+            co_movement = np.sum((close_prices - open_prices) * (base[:, 3] - base[:, 0]))
+            paths[rows] = derive_tick_paths(
+                np.stack([base_paths[row] for row in rows]),
+                base[:, 2],
+                base[:, 1],
+                open_prices,
+                candles.high[rows],
+                candles.low[rows],
+                close_prices,
+                inverse=co_movement < 0
+            )
+        
+        if not aligned.all():
+            rows = np.flatnonzero(~aligned)
+            paths[rows] = generate_tick_paths(
+                candles.open[rows],
+                candles.high[rows],
+                candles.low[rows],
+                candles.close[rows],
+                ticks_per_candle,
+                rng
+            )
+        
+        return paths
+    
+    def pending_load(self):
+        """Return the future of an underlying chunk load that the next generate call may wait on, or None."""
+        with self._lock:
+            return self._window.pending_load(self._next_index + 1)
+    
+    def _read_until(self, timestamp_ms):
+        """Read the underlying's candles starting at or before timestamp_ms. Caller must hold the lock."""
+        window = self._window
+        while window.has(self._next_index) and window.timestamp(self._next_index) <= timestamp_ms:
+            block = window.view(self._next_index, self.block_size)
+            for values in zip(block.timestamp.tolist(), block.open.tolist(), block.high.tolist(),
+                              block.low.tolist(), block.close.tolist()):
+                self._candles[values[0]] = values[1:]
+            self._next_index += len(block)
+            window.release(self._next_index)
+        
+        while len(self._candles) > MAX_CACHED_CANDLES:
+            self._candles.popitem(last=False)
+    
+    def _simulate(self, timestamps, ticks_per_candle):
+        """Simulate the underlying's paths at the given times that are not cached yet. Caller must hold the lock."""
+        missing = []
+        for timestamp_ms in dict.fromkeys(timestamps):
+            candle = self._candles.get(timestamp_ms)
+            if candle is None or candle[1] == candle[2] or (timestamp_ms, ticks_per_candle) in self._paths:
+                continue
+            missing.append(timestamp_ms)
+        if not missing:
+            return
+        
+        values = np.array([self._candles[timestamp_ms] for timestamp_ms in missing])
+        paths = generate_tick_paths(values[:, 0], values[:, 1], values[:, 2], values[:, 3], ticks_per_candle,
+                                    self._rng)
+        for timestamp_ms, path in zip(missing, paths):
+            self._paths[(timestamp_ms, ticks_per_candle)] = path
+        self._path_ticks += paths.size
+    
+    def _evict(self):
+        """Drop the oldest cached paths beyond the tick budget. Caller must hold the lock."""
+        while self._path_ticks > MAX_CACHED_TICKS and self._paths:
+            _, path = self._paths.popitem(last=False)
+            self._path_ticks -= path.size
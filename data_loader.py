@@ -1,99 +1,282 @@
 import json
 import os
-import glob
-from datetime import datetime
-from dateutil import parser
+from candle_cache import default_cache
+from candle_store import CandleStore, parse_timeframe
+from candle_file import BINARY_EXTENSION, read_candle_file
+from candle_stream import DEFAULT_CHUNK_CANDLES, PrefetchIterator
+from symbol_catalog import SymbolCatalog
 
 
 class DataLoader:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", cache=None, catalog=None):
         self.data_dir = data_dir
+        self.cache = cache if cache is not None else default_cache
+        self.catalog = catalog if catalog is not None else SymbolCatalog(data_dir)
         
-    def load_symbol_data(self, symbol):
-        """Load data for a given symbol. Handles regular symbols and options chaining."""
-        if symbol.startswith("OPT_"):
-            return self._load_options_chain(symbol)
-        else:
-            return self._load_regular_symbol(symbol)
-    
-    def _load_regular_symbol(self, symbol):
-        """Load regular symbol data."""
-        timeframes = ["1m", "5m", "15m"]
+    def load_symbol_data(self, symbol, timeframe=None):
+        """
+        Load data for a given symbol. Handles regular symbols and options chaining.
         
-        for timeframe in timeframes:
-            file_pattern = os.path.join(self.data_dir, f"{symbol}_{timeframe}.json")
-            files = glob.glob(file_pattern)
-            
-            if files:
-                return self._load_json_file(files[0])
+        Args:
+            timeframe: Resample the candles to this coarser timeframe, e.g. "5m".
+                Only the finest series is read from disk; the resampled candles
+                are cached per symbol and timeframe.
+        """
+        files = self._resolve_symbol_files(symbol)
+        if not files:
+            return CandleStore.empty()
+        
+        key = self._cache_key(symbol)
+        signature = self._file_signature(files)
+        candles = self._cached_symbol(symbol, signature, timeframe)
+        if candles is not None:
+            return candles
+        
+        if timeframe is not None:
+            return self._resample(self._cache_key(symbol, timeframe), signature, self.load_symbol_data(symbol),
+                                  timeframe)
         
-        return []
+        stores = [self._load_file(file_path) for file_path in files]
+        candles = CandleStore.concat(stores)
+        
+        if signature:
+            # Seeks slice the whole store per file using these, instead of reading the files again.
+            for file_signature, store in zip(signature, stores):
+                self.catalog.record_metadata(file_signature, store)
+        if candles and signature:
+            self.cache.put(key, signature, candles)
+        return candles
+    
+    def stream_symbol_data(self, symbol, chunk_size=DEFAULT_CHUNK_CANDLES, prefetch=True, start_ms=None,
+                           end_ms=None, timeframe=None):
+        """
+        Stream a symbol's candles lazily as CandleStore chunks, expiry by expiry.
+        
+        Only the first chunk has to be loaded before the first tick, instead of
+        every expiry of an options chain. With prefetch the next chunk or expiry
+        file is loaded in a background thread while the current one plays.
+        start_ms and end_ms limit the stream to a time range and timeframe
+        resamples the candles, see iter_symbol_chunks.
+        """
+        chunks = self.iter_symbol_chunks(symbol, chunk_size, start_ms, end_ms, timeframe)
+        if prefetch:
+            return PrefetchIterator(chunks)
+        return chunks
     
-    def _load_options_chain(self, symbol):
-        """Load options data with expiry chaining."""
-        parts = symbol.split("_", 1)
-        if len(parts) < 2:
-            return []
+    def iter_symbol_chunks(self, symbol, chunk_size=DEFAULT_CHUNK_CANDLES, start_ms=None, end_ms=None,
+                           timeframe=None):
+        """
+        Yield a symbol's candles in playback order as chunks of at most chunk_size candles.
         
-        base_symbol = parts[1]
-        file_pattern = os.path.join(self.data_dir, f"OPT_{base_symbol}_*_*.json")
-        files = glob.glob(file_pattern)
+        A fully loaded symbol in the cache is sliced without copying. Otherwise
+        each data file is loaded (and cached on its own) only when playback
+        reaches it. Binary files are memory-mapped, so their chunks are only
+        paged in when read; JSON files are parsed whole.
+        
+        Args:
+            start_ms: Skip candles starting before this epoch-ms time
+            end_ms: Stop after the last candle starting at or before this epoch-ms time
+            timeframe: Resample each file's candles to this coarser timeframe, e.g. "5m"
+        """
+        if start_ms is None and end_ms is None:
+            stores = self._iter_symbol_stores(symbol, timeframe)
+        else:
+            stores = self._iter_symbol_stores_between(symbol, start_ms, end_ms, timeframe)
         
+        for store in stores:
+            for start in range(0, len(store), chunk_size):
+                yield store.slice(start, start + chunk_size)
+    
+    def _iter_symbol_stores(self, symbol, timeframe=None):
+        """Yield the candles of each of a symbol's files, or its whole cached store."""
+        files = self._resolve_symbol_files(symbol)
         if not files:
-            return []
+            return
+        
+        signature = self._file_signature(files)
+        candles = self._cached_symbol(symbol, signature, timeframe)
+        if candles is not None:
+            yield candles
+            return
         
-        file_expiry_map = []
         for file_path in files:
-            filename = os.path.basename(file_path)
-            parts = filename.replace(".json", "").split("_")
-            if len(parts) >= 3:
-                expiry_str = parts[2]
-                try:
-                    expiry_date = datetime.strptime(expiry_str, "%d%m%Y")
-                    file_expiry_map.append((expiry_date, file_path))
-                except ValueError:
+            yield self._load_cached_file(file_path, timeframe)
+    
+    def _iter_symbol_stores_between(self, symbol, start_ms, end_ms, timeframe=None):
+        """
+        Yield the candles of a symbol's files that start in [start_ms, end_ms].
+        
+        Expiry files whose expiry day ends before the range are skipped by name,
+        and as files play in order, those after the first one starting past the
+        range are never opened. The catalog's per-file time ranges pick among the
+        rest; a file read for its time range is kept in the cache, so it is parsed
+        only once. Within a file the first and last candle are found by binary
+        search over its timestamps.
+        """
+        files = [catalog_file for catalog_file in self.catalog.playback_files(symbol) if catalog_file.path]
+        if not files:
+            return
+        
+        signature = self._file_signature([catalog_file.path for catalog_file in files])
+        candles = None
+        if signature and timeframe is None:
+            candles = self.cache.get(self._cache_key(symbol), signature)
+        # A cached whole-symbol store is sliced per file using the row counts recorded when it was
+        # built. Without them the files are read one by one below rather than all to count their rows.
+        if candles is not None:
+            known = [self.catalog.known_metadata(file_signature) for file_signature in signature]
+            if None in known or sum(metadata[0] for metadata in known) != len(candles):
+                candles = None
+        
+        offset = 0
+        for index, catalog_file in enumerate(files):
+            if candles is None:
+                expiry_end_ms = catalog_file.expiry_end_ms
+                if start_ms is not None and expiry_end_ms is not None and expiry_end_ms < start_ms:
                     continue
+                row_count, first_ms, last_ms = self.catalog.metadata(catalog_file, load=self._load_cached_file)
+            else:
+                row_count, first_ms, last_ms = known[index]
+            file_start = offset
+            offset += row_count
+            if not row_count:
+                continue
+            if timeframe is not None:
+                # The first resampled candle starts at the start of its interval.
+                first_ms -= first_ms % parse_timeframe(timeframe)
+            if end_ms is not None and first_ms > end_ms:
+                if candles is None:
+                    break
+                continue
+            if start_ms is not None and last_ms < start_ms:
+                continue
+            
+            if candles is not None:
+                store = candles.slice(file_start, offset)
+            else:
+                store = self._load_cached_file(catalog_file.path, timeframe)
+            yield store.between(start_ms, end_ms)
+    
+    def _load_cached_file(self, file_path, timeframe=None):
+        """Load a single data file through the cache, keyed by its path and the timeframe it is resampled to."""
+        key = (os.path.abspath(file_path),)
+        if timeframe is not None:
+            key += (parse_timeframe(timeframe),)
+        signature = self._file_signature([file_path])
+        candles = self.cache.get(key, signature) if signature else None
+        if candles is not None:
+            return candles
         
-        if not file_expiry_map:
-            return []
+        if timeframe is not None:
+            return self._resample(key, signature, self._load_cached_file(file_path), timeframe)
         
-        file_expiry_map.sort(key=lambda x: x[0])
+        candles = self._load_file(file_path)
+        if candles and signature:
+            self.cache.put(key, signature, candles)
+        return candles
+    
+    def _cached_symbol(self, symbol, signature, timeframe=None):
+        """
+        Return a symbol's whole store from the cache, or None.
         
-        all_candles = []
-        for expiry_date, file_path in file_expiry_map:
-            candles = self._load_json_file(file_path)
-            all_candles.extend(candles)
+        A symbol cached at its own timeframe is resampled to a requested
+        coarser timeframe instead of being reloaded.
+        """
+        if not signature:
+            return None
+        candles = self.cache.get(self._cache_key(symbol, timeframe), signature)
+        if candles is None and timeframe is not None:
+            candles = self.cache.get(self._cache_key(symbol), signature)
+            if candles is not None:
+                candles = self._resample(self._cache_key(symbol, timeframe), signature, candles, timeframe)
+        return candles
+    
+    def _resample(self, key, signature, candles, timeframe):
+        """Resample candles to a timeframe and cache the result under key, unless nothing was merged."""
+        resampled = candles.resample(parse_timeframe(timeframe))
+        if resampled is not candles and resampled and signature:
+            self.cache.put(key, signature, resampled)
+        return resampled
+    
+    def get_signature(self, symbol):
+        """Return the cache signature of a symbol's current data files, or None if it has none."""
+        files = self._resolve_symbol_files(symbol)
+        if not files:
+            return None
+        return self._file_signature(files)
+    
+    def add_to_cache(self, symbol, signature, candles, row_counts=None):
+        """
+        Cache candles loaded elsewhere, e.g. in another process, under a file signature.
         
-        return all_candles
+        Args:
+            row_counts: Row count of each file of the signature, see row_counts; lets
+                seeks slice the store per file without reading the files
+        """
+        if candles and signature:
+            self.cache.put(self._cache_key(symbol), signature, candles)
+            if row_counts is not None and sum(row_counts) == len(candles):
+                offset = 0
+                for file_signature, row_count in zip(signature, row_counts):
+                    self.catalog.record_metadata(file_signature, candles.slice(offset, offset + row_count))
+                    offset += row_count
+    
+    def is_cached(self, symbol, signature):
+        """Check whether a symbol's whole store is in the cache under a file signature."""
+        return self.cache.contains(self._cache_key(symbol), signature)
+    
+    def row_counts(self, signature):
+        """Return the row count of each file of a signature as recorded when loading it, or None if any is unknown."""
+        known = [self.catalog.known_metadata(file_signature) for file_signature in signature]
+        if None in known:
+            return None
+        return [metadata[0] for metadata in known]
+    
+    def _cache_key(self, symbol, timeframe=None):
+        if timeframe is None:
+            return (os.path.abspath(self.data_dir), symbol)
+        return (os.path.abspath(self.data_dir), symbol, parse_timeframe(timeframe))
+    
+    def _resolve_symbol_files(self, symbol):
+        """Return the data files backing a symbol, in playback order."""
+        return self.catalog.resolve(symbol)
+    
+    def _file_signature(self, files):
+        """Build a cache signature from the paths, mtimes and sizes of the given files."""
+        signature = []
+        for file_path in files:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                return None
+            signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+    
+    def _load_file(self, file_path):
+        """Load candles from a binary or JSON data file."""
+        if file_path.endswith(BINARY_EXTENSION):
+            return self._load_binary_file(file_path)
+        return self._load_json_file(file_path)
+    
+    def _load_binary_file(self, file_path):
+        """Memory-map candles from a binary candle file."""
+        try:
+            return read_candle_file(file_path)
+        except Exception as e:
+            print(f"Error loading file {file_path}: {e}")
+            return CandleStore.empty()
     
     def _load_json_file(self, file_path):
-        """Load candles from JSON file and parse timestamps."""
+        """Load candles from JSON file into a columnar store."""
         try:
             with open(file_path, 'r') as f:
                 data = json.load(f)
             
-            for candle in data:
-                if 'timestamp' in candle:
-                    candle['datetime'] = parser.parse(candle['timestamp'])
-            
-            return data
+            return CandleStore.from_records(data)
         except Exception as e:
             print(f"Error loading file {file_path}: {e}")
-            return []
+            return CandleStore.empty()
     
     def get_available_symbols(self):
         """Get list of all available symbols in the data directory."""
-        symbols = set()
-        
-        for file_path in glob.glob(os.path.join(self.data_dir, "*_*.json")):
-            filename = os.path.basename(file_path)
-            if filename.startswith("OPT_"):
-                parts = filename.replace(".json", "").split("_")
-                if len(parts) >= 3:
-                    symbols.add(f"OPT_{parts[1]}")
-            else:
-                parts = filename.replace(".json", "").split("_")
-                if len(parts) >= 2:
-                    symbols.add(parts[0])
-        
-        return list(symbols)
+        return self.catalog.symbols()
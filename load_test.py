@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import websockets
+from benchmark import synthetic_candles, write_results
+from candle_file import write_candle_file
+from serializers import BINARY_TICK_RECORD, loads
+
+
+SYNTHETIC_SYMBOLS = ("LOADA", "LOADB", "LOADC", "LOADD")
+SYNTHETIC_CANDLES = 1875
+CONNECT_CONCURRENCY = 100
+SERVER_START_TIMEOUT_SECONDS = 30
+
+
+def write_synthetic_data(data_dir, symbols=SYNTHETIC_SYMBOLS, count=SYNTHETIC_CANDLES):
+    """Write binary 1m candle files for the synthetic symbols, so a load test needs no data folder."""
+    for i, symbol in enumerate(symbols):
+        candles = synthetic_candles(count, start_price=10000.0 * (i + 1), seed=i)
+        write_candle_file(os.path.join(data_dir, f"{symbol}_1m.bin"), candles)
+
+
+def process_tree(pid):
+    """Return pid and the pids of all its descendants, e.g. the workers of a multi-process server."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def cpu_seconds(pids):
+    """Total user and system CPU time of the given processes, from /proc; None where /proc is missing."""
+    total = 0.0
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        # utime and stime are fields 14 and 15 of the stat line, 12 and 13 after the command name.
+        total += (int(fields[11]) + int(fields[12])) / clock_ticks
+    return total
+
+
+def rss_bytes(pids):
+    """Total resident set size of the given processes, from /proc; None where /proc is missing."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            return None
+    return total
+
+
+def tick_timestamps(message):
+    """Return the timestamps of the ticks in a json or binary tick frame."""
+    if isinstance(message, bytes):
+        return [BINARY_TICK_RECORD.unpack_from(message, offset)[1]
+                for offset in range(0, len(message), BINARY_TICK_RECORD.size)]
+    
+    data = loads(message)
+    if isinstance(data, list):
+        return [tick["timestamp"] for tick in data]
+    if "timestamp" in data:
+        return [data["timestamp"]]
+    return []
+
+
+async def run_client(uri, request, connect_slots, connected, window, result):
+    """
+    Subscribe one client and record the latency of every tick received in the measurement window.
+    
+    Latency is the receive time minus the tick timestamp, which the server
+    stamps from its wall clock when it generates the tick (overrideTime off),
+    so it covers generation, queueing, encoding and the socket.
+    """
+    try:
+        async with connect_slots:
+            websocket = await websockets.connect(uri, max_size=None)
+            await websocket.send(json.dumps(request))
+    except Exception as e:
+        result["failed"] += 1
+        result["errors"][type(e).__name__] = result["errors"].get(type(e).__name__, 0) + 1
+        connected()
+        return
+    
+    result["connected"] += 1
+    connected()
+    latencies = result["latencies"]
+    try:
+        async for message in websocket:
+            now_ms = time.time() * 1000
+            start, end = window
+            if start is None or now_ms < start * 1000:
+                continue
+            if now_ms >= end * 1000:
+                break
+            for timestamp in tick_timestamps(message):
+                latencies.append(now_ms - timestamp)
+    except websockets.exceptions.ConnectionClosed:
+        result["closed"] += 1
+    finally:
+        await websocket.close()
+
+
+def run_client_process(uri, request, clients, warmup, duration, barrier, results):
+    """Entry point of a load generator process: run its share of clients through one measurement window."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+    
+    result = {"connected": 0, "failed": 0, "closed": 0, "errors": {}, "latencies": []}
+    
+    async def main():
+        loop = asyncio.get_running_loop()
+        connect_slots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        all_connected = asyncio.Event()
+        window = [None, None]
+        pending = clients
+        
+        def connected():
+            nonlocal pending
+            pending -= 1
+            if pending == 0:
+                all_connected.set()
+        
+        tasks = [asyncio.ensure_future(run_client(uri, request, connect_slots, connected, window, result))
+                 for _ in range(clients)]
+        await all_connected.wait()
+        # Every process starts measuring together, once all clients everywhere are subscribed.
+        await loop.run_in_executor(None, barrier.wait)
+        window[0] = time.time() + warmup
+        window[1] = window[0] + duration
+        
+        await asyncio.wait(tasks, timeout=warmup + duration + 1)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    asyncio.run(main())
+    results.put(result)
+
+
+def percentile(sorted_values, q):
+    """Return the q quantile of already sorted values, None if there are none."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def wait_for_port(host, port, timeout):
+    """Wait until host:port accepts TCP connections; returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_server(args, data_dir):
+    """Start main.py in a subprocess and wait until it accepts connections."""
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"),
+               "--host", args.host, "--port", str(args.port), "--data-dir", data_dir, "--workers", str(args.workers)]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for_port(args.host, args.port, SERVER_START_TIMEOUT_SECONDS):
+        server.kill()
+        raise RuntimeError(f"Server did not start listening on {args.host}:{args.port}")
+    return server
+
+
+def run_load_test(args):
+    """Run the clients in worker processes and measure throughput, latency and server resource use."""
+    request = {
+        "action": "SUBSCRIBE",
+        "symbols": args.symbols,
+        "tickFrequencyMs": args.tick_frequency_ms,
+        "overrideTime": False,
+        "encoding": args.encoding,
+        "batch": args.batch,
+        "broadcast": args.broadcast
+    }
+    uri = f"ws://{args.host}:{args.port}"
+    processes = max(1, min(args.processes, args.clients))
+    barrier = multiprocessing.Barrier(processes + 1)
+    results = multiprocessing.Queue()
+    
+    workers = []
+    for i in range(processes):
+        share = args.clients // processes + (1 if i < args.clients % processes else 0)
+        worker = multiprocessing.Process(target=run_client_process,
+                                         args=(uri, request, share, args.warmup, args.duration, barrier, results))
+        worker.start()
+        workers.append(worker)
+    
+    barrier.wait()
+    time.sleep(args.warmup)
+    pids = process_tree(args.pid) if args.pid else []
+    cpu_start = cpu_seconds(pids) if pids else None
+    wall_start = time.monotonic()
+    time.sleep(args.duration)
+    cpu_end = cpu_seconds(pids) if pids else None
+    wall_elapsed = time.monotonic() - wall_start
+    rss = rss_bytes(pids) if pids else None
+    
+    collected = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    
+    latencies = sorted(latency for result in collected for latency in result["latencies"])
+    cpu_percent = None
+    if cpu_start is not None and cpu_end is not None:
+        cpu_percent = 100.0 * (cpu_end - cpu_start) / wall_elapsed
+    errors = {}
+    for result in collected:
+        for name, count in result["errors"].items():
+            errors[name] = errors.get(name, 0) + count
+    
+    return {
+        "clients": args.clients,
+        "connected": sum(result["connected"] for result in collected),
+        "failed": sum(result["failed"] for result in collected),
+        "closed_early": sum(result["closed"] for result in collected),
+        "errors": errors,
+        "duration_seconds": args.duration,
+        "ticks": len(latencies),
+        "ticks_per_second": len(latencies) / args.duration,
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None
+        },
+        "server": {
+            "processes": len(pids),
+            "cpu_percent": cpu_percent,
+            "rss_mb": rss / 1024 / 1024 if rss is not None else None
+        }
+    }
+
+
+def main():
+    """Open many websocket clients against a server and report ticks/s, latency, CPU and RSS."""
+    parser = argparse.ArgumentParser(description="Load test the tick server with many concurrent clients.")
+    parser.add_argument("--clients", type=int, default=1000, help="Concurrent websocket clients")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Load generator processes the clients are spread over")
+    parser.add_argument("--duration", type=float, default=10, help="Measurement window in seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds to wait after all clients subscribed")
+    parser.add_argument("--symbols", nargs="+", default=None,
+                        help="Symbols each client subscribes to (default: the synthetic symbols)")
+    parser.add_argument("--tick-frequency-ms", type=int, default=100, help="tickFrequencyMs of every client")
+    parser.add_argument("--encoding", default="json", choices=["json", "binary"], help="Wire encoding")
+    parser.add_argument("--batch", action="store_true", help="Subscribe with batch frames")
+    parser.add_argument("--broadcast", action="store_true", help="Subscribe to shared broadcast streams")
+    parser.add_argument("--host", default="localhost", help="Server host")
+    parser.add_argument("--port", type=int, default=8765, help="Server port")
+    parser.add_argument("--spawn", action="store_true",
+                        help="Start main.py for the test, on synthetic data unless --data-dir is given")
+    parser.add_argument("--data-dir", default=None, help="Data folder of the spawned server")
+    parser.add_argument("--workers", type=int, default=1, help="--workers of the spawned server")
+    parser.add_argument("--pid", type=int, default=None,
+                        help="Pid of an already running server to measure CPU and RSS of (Linux)")
+    parser.add_argument("--json", metavar="PATH", default=None,
+                        help="Also write machine-readable results to PATH ('-' for stdout)")
+    args = parser.parse_args()
+    
+    if args.symbols is None:
+        if not args.spawn or args.data_dir:
+            parser.error("--symbols is required unless the server is spawned on synthetic data")
+        args.symbols = list(SYNTHETIC_SYMBOLS)
+    
+    server = None
+    temp_dir = None
+    try:
+        if args.spawn:
+            data_dir = args.data_dir
+            if data_dir is None:
+                temp_dir = tempfile.TemporaryDirectory()
+                data_dir = temp_dir.name
+                write_synthetic_data(data_dir)
+            server = start_server(args, data_dir)
+            args.pid = server.pid
+        
+        result = run_load_test(args)
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+    
+    latency = result["latency_ms"]
+    out = sys.stderr if args.json == "-" else sys.stdout
+    print(f"Clients: {result['connected']}/{result['clients']} connected, {result['failed']} failed, "
+          f"{result['closed_early']} closed early", file=out)
+    print(f"Throughput: {result['ticks']} ticks in {result['duration_seconds']:.0f}s "
+          f"({result['ticks_per_second']:.0f} ticks/s)", file=out)
+    if latency["p50"] is not None:
+        print(f"Latency: p50 {latency['p50']:.1f}ms, p99 {latency['p99']:.1f}ms, max {latency['max']:.1f}ms",
+              file=out)
+    if result["server"]["cpu_percent"] is not None:
+        print(f"Server: {result['server']['cpu_percent']:.0f}% CPU, {result['server']['rss_mb']:.0f} MB RSS "
+              f"over {result['server']['processes']} processes", file=out)
+    
+    if args.json:
+        write_results(args.json, "load_test", args, result)
+
+
+if __name__ == "__main__":
+    main()
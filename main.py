@@ -1,14 +1,40 @@
+import argparse
 import asyncio
+from preloader import preload_symbols
 from websocket_server import WebSocketServer
+from worker_pool import run_workers
 
 
 def main():
     """
     Main entry point for the stock tick simulator.
     """
-    server = WebSocketServer(host="localhost", port=8765)
+    parser = argparse.ArgumentParser(description="Stock tick simulator websocket server.")
+    parser.add_argument("--host", default="localhost", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--data-dir", default="data", help="Directory holding the candle data files")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes sharing the port and candle data (default: 1)")
+    parser.add_argument("--preload", nargs="*", metavar="SYMBOL",
+                        help="Load these symbols (all symbols if none are given) before accepting clients")
+    parser.add_argument("--preload-processes", type=int,
+                        help="Processes parsing data files in parallel for --preload and --workers "
+                             "(default: CPU count)")
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        # Workers share every symbol, so all of them are loaded up front anyway.
+        try:
+            run_workers(args.host, args.port, args.workers, args.data_dir, args.preload_processes)
+        except Exception as e:
+            print(f"Server error: {e}")
+        return
+    
+    server = WebSocketServer(host=args.host, port=args.port, data_dir=args.data_dir)
     
     try:
+        if args.preload is not None:
+            preload_symbols(server.data_loader, args.preload, args.preload_processes)
         asyncio.run(server.start())
     except KeyboardInterrupt:
         print("\nServer stopped by user")
@@ -0,0 +1,277 @@
+import bisect
+import math
+from bar_builder import BarKey
+
+
+# Upper bounds in seconds, from single-tick work (microseconds) to slow socket sends.
+DEFAULT_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Time one in this many hot-path calls; counters are always exact.
+DEFAULT_SAMPLE_EVERY = 16
+
+
+class CounterValue:
+    def __init__(self):
+        """Monotonic count of one label combination of a counter."""
+        self.value = 0
+    
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class HistogramValue:
+    def __init__(self, buckets):
+        """
+        Bucketed observations of one label combination of a histogram.
+        
+        Args:
+            buckets: Sorted bucket upper bounds; a final +Inf bucket is implied
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket that holds it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+
+class Metric:
+    metric_type = None
+    
+    def __init__(self, name, help, labelnames=()):
+        """
+        A named metric with one value per combination of label values.
+        
+        Args:
+            name: Prometheus metric name
+            help: One-line description shown in the exposition
+            labelnames: Names of the labels, e.g. ("symbol",)
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+    
+    def labels(self, *values):
+        """
+        Return the value for the given label values, creating it on first use.
+        
+        Hot paths can keep the returned value around instead of looking it up
+        on every update.
+        """
+        value = self._values.get(values)
+        if value is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            value = self._new_value()
+            self._values[values] = value
+        return value
+    
+    def _new_value(self):
+        """Create the value of a new label combination, e.g. a CounterValue; subclasses must override this."""
+        raise NotImplementedError(f"{type(self).__name__} does not define _new_value")
+    
+    def items(self):
+        """Return (label values, value) pairs."""
+        return list(self._values.items())
+    
+    def label_pairs(self, labels):
+        """Pair label values with the label names."""
+        return list(zip(self.labelnames, labels))
+
+
+class Counter(Metric):
+    metric_type = "counter"
+    
+    def _new_value(self):
+        return CounterValue()
+    
+    def inc(self, amount=1):
+        """Increment the counter without labels."""
+        self.labels().inc(amount)
+    
+    def samples(self):
+        return [("", self.label_pairs(labels), value.value) for labels, value in self.items()]
+    
+    def snapshot(self):
+        return {_label_key(labels): value.value for labels, value in self.items()}
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+    
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_value(self):
+        return HistogramValue(self.buckets)
+    
+    def observe(self, value):
+        """Record an observation without labels."""
+        self.labels().observe(value)
+    
+    def samples(self):
+        samples = []
+        for labels, value in self.items():
+            pairs = self.label_pairs(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), value.counts):
+                cumulative += count
+                samples.append(("_bucket", pairs + [("le", _format_value(bound))], cumulative))
+            samples.append(("_sum", pairs, value.sum))
+            samples.append(("_count", pairs, value.count))
+        return samples
+    
+    def snapshot(self):
+        return {
+            _label_key(labels): {
+                "count": value.count,
+                "sum": value.sum,
+                "p50": value.quantile(0.5),
+                "p99": value.quantile(0.99)
+            }
+            for labels, value in self.items()
+        }
+
+
+class CallbackMetric(Metric):
+    def __init__(self, name, help, callback, labelnames=(), metric_type="gauge"):
+        """
+        A metric read from existing state when collected, e.g. cache or scheduler stats.
+        
+        Args:
+            callback: Returns the value, or with labelnames a mapping of label
+                value tuples to values
+            metric_type: "gauge", or "counter" for values that only grow
+        """
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+        self.metric_type = metric_type
+    
+    def items(self):
+        result = self.callback()
+        if not self.labelnames:
+            return [((), result)]
+        return list(result.items())
+    
+    def samples(self):
+        return [("", self.label_pairs(labels), value) for labels, value in self.items()]
+    
+    def snapshot(self):
+        return {_label_key(labels): value for labels, value in self.items()}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Named counters, histograms and collected gauges, rendered as Prometheus text or a dict."""
+        self._metrics = {}
+    
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+    
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+    
+    def collect(self, name, help, callback, labelnames=(), metric_type="gauge"):
+        """Register a metric whose value is read from callback at collection time."""
+        return self._register(CallbackMetric(name, help, callback, labelnames, metric_type))
+    
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, pairs, value in metric.samples():
+                label_text = ",".join(f'{name}="{_escape(str(label))}"' for name, label in pairs)
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+    
+    def snapshot(self):
+        """Return every metric as plain values, keyed by name and then by comma-joined label values."""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+class TickMetrics:
+    def __init__(self, registry, sample_every=DEFAULT_SAMPLE_EVERY):
+        """
+        Handles for the metrics updated on the tick hot path.
+        
+        Tick counts are exact. Stage latencies (generation, formatting,
+        serialization, socket send) are timed on one in sample_every calls, so
+        the clock reads stay off most ticks; 0 turns the timing off.
+        """
+        self.ticks_generated = registry.counter(
+            "ticksim_ticks_generated_total", "Ticks generated, per symbol", ("symbol",))
+        self.ticks_sent = registry.counter(
+            "ticksim_ticks_sent_total", "Ticks written to client sockets, per symbol", ("symbol",))
+        self.messages_sent = registry.counter(
+            "ticksim_messages_sent_total", "Frames written to client sockets")
+        self.bars_sent = registry.counter(
+            "ticksim_bars_sent_total", "Bar messages written to client sockets, per symbol", ("symbol",))
+        self.stage_seconds = registry.histogram(
+            "ticksim_stage_seconds", "Sampled latency of tick pipeline stages", ("stage",))
+        self.generate = self.stage_seconds.labels("generate")
+        self.format = self.stage_seconds.labels("format")
+        self.serialize = self.stage_seconds.labels("serialize")
+        self.send = self.stage_seconds.labels("send")
+        self.sample_every = sample_every
+        self._calls = 0
+    
+    def sample(self):
+        """Return True on every sample_every-th call, i.e. when this call should be timed."""
+        if not self.sample_every:
+            return False
+        self._calls += 1
+        return self._calls % self.sample_every == 0
+    
+    def count_sent(self, key):
+        """Count a frame written to a socket under its send queue key: a symbol, a tuple of symbols or a BarKey."""
+        self.messages_sent.labels().inc()
+        if isinstance(key, BarKey):
+            self.bars_sent.labels(key.symbol).inc()
+        elif isinstance(key, tuple):
+            for symbol in key:
+                self.ticks_sent.labels(symbol).inc()
+        elif key is not None:
+            self.ticks_sent.labels(key).inc()
+
+
+def _label_key(labels):
+    return ",".join(str(label) for label in labels)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
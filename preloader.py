@@ -0,0 +1,109 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from candle_cache import CandleCache
+from candle_file import BINARY_EXTENSION
+from data_loader import DataLoader
+
+
+# Loader of a preload process, built once per process by _init_worker.
+_worker_loader = None
+
+
+def _init_worker(data_dir):
+    """Pool initializer: scan the data directory once per process instead of once per symbol."""
+    global _worker_loader
+    # A private cache: the loads are handed back to the parent, not kept here.
+    _worker_loader = DataLoader(data_dir, cache=CandleCache())
+
+
+def _load(loader, symbol):
+    """Load one symbol; returns (symbol, signature, candles, row counts of its files)."""
+    signature = loader.get_signature(symbol)
+    candles = loader.load_symbol_data(symbol)
+    return symbol, signature, candles, loader.row_counts(signature) if signature else None
+
+
+def _load_in_worker(symbol):
+    """Load and parse one symbol in a preload process, see _load."""
+    return _load(_worker_loader, symbol)
+
+
+def _needs_parsing(loader, symbol):
+    """Check whether any of a symbol's files is JSON, which is worth parsing in another process."""
+    return any(not path.endswith(BINARY_EXTENSION) for path in loader.catalog.resolve(symbol))
+
+
+def preload_symbols(loader, symbols=None, processes=None):
+    """
+    Load symbols into a loader's cache before clients ask for them.
+    
+    JSON-backed symbols are parsed in parallel in a process pool and the parsed
+    candles are sent back to this process. Binary files are only memory-mapped,
+    so those symbols are loaded here without the round trip. Progress and timing
+    are printed as symbols finish. The cache is bounded, so when the symbols do
+    not fit its budget the least recently loaded ones are evicted again; the
+    summary reports what is still cached and warns about the rest.
+    
+    Args:
+        loader: DataLoader whose cache receives the candles
+        symbols: Symbols to load; every symbol of the data directory when None or empty
+        processes: Size of the process pool, the CPU count when None; 1 loads
+            everything in this process
+    
+    Returns:
+        Dictionary of symbol to (signature, candles, row_counts) for the symbols
+        that have data, cached or not, row_counts as for DataLoader.add_to_cache
+    """
+    available = set(loader.get_available_symbols())
+    if not symbols:
+        symbols = sorted(available)
+    missing = [symbol for symbol in symbols if symbol not in available]
+    if missing:
+        print(f"Preload: no data for {', '.join(missing)}")
+    symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol in available]
+    
+    processes = processes or os.cpu_count() or 1
+    parsed = [symbol for symbol in symbols if processes > 1 and _needs_parsing(loader, symbol)]
+    local = [symbol for symbol in symbols if symbol not in parsed]
+    pool_size = min(processes, len(parsed)) if parsed else 1
+    loaded = {}
+    done = 0
+    start = time.perf_counter()
+    
+    def finish(symbol, signature, candles, row_counts):
+        nonlocal done
+        done += 1
+        if candles and signature:
+            loader.add_to_cache(symbol, signature, candles, row_counts)
+            loaded[symbol] = (signature, candles, row_counts)
+        note = "" if not candles or loader.is_cached(symbol, signature) else " (larger than the cache budget)"
+        print(f"Preloaded {done}/{len(symbols)} {symbol}: {len(candles)} candles{note} "
+              f"at {time.perf_counter() - start:.2f}s")
+    
+    if parsed:
+        with ProcessPoolExecutor(pool_size, initializer=_init_worker,
+                                 initargs=(loader.data_dir,)) as executor:
+            futures = [executor.submit(_load_in_worker, symbol) for symbol in parsed]
+            # Binary symbols load here while the pool parses.
+            for symbol in local:
+                finish(*_load(loader, symbol))
+            for future in as_completed(futures):
+                finish(*future.result())
+    else:
+        for symbol in local:
+            finish(*_load(loader, symbol))
+    
+    total_candles = sum(len(candles) for _, candles, _ in loaded.values())
+    total_bytes = sum(candles.nbytes for _, candles, _ in loaded.values())
+    print(f"Preloaded {len(loaded)} symbols ({total_candles} candles, {total_bytes / 1024 / 1024:.1f} MB) "
+          f"in {time.perf_counter() - start:.2f}s with {pool_size} processes")
+    
+    evicted = [symbol for symbol, (signature, _, _) in loaded.items() if not loader.is_cached(symbol, signature)]
+    cache = loader.cache.stats()
+    print(f"Candle cache: {cache['entries']} entries, {cache['bytes'] / 1024 / 1024:.1f} of "
+          f"{cache['max_bytes'] / 1024 / 1024:.1f} MB")
+    if evicted:
+        print(f"Preload: {len(evicted)} of {len(loaded)} symbols did not fit the candle cache and will be "
+              f"loaded again when subscribed: {', '.join(sorted(evicted))}")
+    return loaded
@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+DEFAULT_INTERVAL_MS = 5
+MAX_STACK_DEPTH = 64
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None):
+        """
+        Statistical profiler that samples the stack of one thread from a background thread.
+        
+        Nothing runs while the profiler is stopped, so it can stay attached to
+        a production server and be switched on when a regression shows up.
+        While running, the target thread's current stack is recorded every
+        interval, costing it one frame walk per sample.
+        
+        Args:
+            thread_id: Thread to sample, the thread calling start() when None
+        """
+        self.thread_id = thread_id
+        self.interval_ms = DEFAULT_INTERVAL_MS
+        self.samples = 0
+        self.started_at = None
+        self.elapsed_seconds = 0.0
+        self._stacks = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+    
+    @property
+    def running(self):
+        return self._thread is not None
+    
+    def start(self, interval_ms=DEFAULT_INTERVAL_MS, reset=True):
+        """Start sampling every interval_ms; returns False if it was already running."""
+        if self.running:
+            return False
+        if reset:
+            self.reset()
+        self.interval_ms = max(1, interval_ms)
+        target = self.thread_id if self.thread_id is not None else threading.get_ident()
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, args=(target,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+    
+    def stop(self):
+        """Stop sampling and keep the collected stacks; returns False if it was not running."""
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed_seconds += time.monotonic() - self.started_at
+        self.started_at = None
+        return True
+    
+    def reset(self):
+        """Drop the collected stacks."""
+        self._stacks = Counter()
+        self.samples = 0
+        self.elapsed_seconds = 0.0
+    
+    def _run(self, target):
+        interval = self.interval_ms / 1000.0
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self._stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+    
+    def report(self, limit=20):
+        """
+        Summarize the samples per function.
+        
+        Returns:
+            Dict with the sample count and the top functions by self samples
+            (the function was running) and by total samples (it was on the stack)
+        """
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in list(self._stacks.items()):
+            self_counts[stack[-1]] += count
+            for function in set(stack):
+                total_counts[function] += count
+        
+        def top(counts):
+            return [
+                {"function": _describe(function), "samples": count, "percent": round(100.0 * count / self.samples, 1)}
+                for function, count in counts.most_common(limit)
+            ]
+        
+        elapsed = self.elapsed_seconds
+        if self.started_at is not None:
+            elapsed += time.monotonic() - self.started_at
+        return {
+            "running": self.running,
+            "interval_ms": self.interval_ms,
+            "samples": self.samples,
+            "elapsed_seconds": round(elapsed, 3),
+            "self": top(self_counts) if self.samples else [],
+            "total": top(total_counts) if self.samples else []
+        }
+    
+    def collapsed(self):
+        """Return the samples as collapsed stacks ("outer;inner count" per line), the input of flamegraph tools."""
+        lines = [
+            ";".join(_describe(function) for function in stack) + f" {count}"
+            for stack, count in list(self._stacks.items())
+        ]
+        return "\n".join(sorted(lines)) + "\n"
+
+
+def _describe(function):
+    filename, lineno, name = function
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
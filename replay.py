@@ -0,0 +1,138 @@
+import argparse
+import heapq
+import sys
+import time
+from candle_store import parse_timestamp_ms
+from correlated_paths import CorrelatedPaths
+from data_loader import DataLoader
+from tick_generator import TickGenerator
+
+
+def iter_generator_ticks(symbol, generator, candles=False):
+    """
+    Yield every tick of a replay-mode generator as (symbol, timestamp_ms, price).
+    
+    Timestamps come from candle time: the k-th tick of a candle is stamped
+    k tick intervals after the candle start. With candles each tick also
+    carries the start time and volume of its candle, for building bars:
+    (symbol, timestamp_ms, price, candle_ms, volume).
+    """
+    while generator.has_more_data():
+        if generator.should_advance_candle():
+            if not generator.advance_candle():
+                break
+        
+        timestamp_ms = generator.get_current_timestamp_ms()
+        tick_price = generator.generate_tick()
+        if tick_price is None:
+            break
+        if candles:
+            yield (symbol, timestamp_ms, tick_price, generator.current_candle_ms, generator.current_candle_volume)
+        else:
+            yield (symbol, timestamp_ms, tick_price)
+
+
+def merge_ticks(symbol_generators, candles=False):
+    """
+    Merge the ticks of several replay-mode generators into one timestamp-ordered stream.
+    
+    Sources with their own iter_ticks, such as a TapeGenerator playing a
+    recorded tape, are read as they are instead of being generated.
+    """
+    streams = [
+        generator.iter_ticks(symbol) if hasattr(generator, "iter_ticks")
+        else iter_generator_ticks(symbol, generator, candles)
+        for symbol, generator in symbol_generators.items()
+    ]
+    return heapq.merge(*streams, key=lambda tick: tick[1])
+
+
+def replay(symbols, ticks_per_candle=600, data_dir="data", batch_size=None, seed=None, data_loader=None,
+           start_ms=None, end_ms=None, timeframe=None, correlated=None):
+    """
+    Replay historical ticks in-process as fast as they can be consumed.
+    
+    Candles advance after exactly ticks_per_candle ticks and no wall-clock time
+    is involved, so a trading day of 1m candles is replayed in seconds.
+    
+    Args:
+        symbols: Symbols to replay, including OPT_ chains
+        ticks_per_candle: Ticks generated per candle
+        data_dir: Data directory, used when data_loader is not given
+        batch_size: Precompute tick paths for this many candles at a time
+        seed: Seed for the price noise, for reproducible replays
+        data_loader: DataLoader to load candles with, sharing its cache
+        start_ms: Start at the first candle starting at or after this epoch-ms time
+        end_ms: Stop after the last candle starting at or before this epoch-ms time
+        timeframe: Resample the candles to this coarser timeframe, e.g. "5m"
+        correlated: Underlying symbol whose simulated intra-candle path every
+            symbol's ticks are derived from, see CorrelatedPaths
+    
+    Returns:
+        Iterator of (symbol, timestamp_ms, price) tuples in timestamp order across symbols
+    """
+    data_loader = data_loader or DataLoader(data_dir)
+    
+    paths = None
+    if correlated is not None:
+        if data_loader.get_signature(correlated) is None:
+            raise ValueError(f"No data found for underlying symbol: {correlated}")
+        paths = CorrelatedPaths(data_loader.stream_symbol_data(correlated, start_ms=start_ms, end_ms=end_ms,
+                                                               timeframe=timeframe), seed)
+    
+    symbol_generators = {}
+    for symbol in symbols:
+        candles = data_loader.stream_symbol_data(symbol, start_ms=start_ms, end_ms=end_ms, timeframe=timeframe)
+        generator = TickGenerator(candles, ticks_per_candle, batch_size, seed, replay=True, paths=paths)
+        if not generator.has_more_data():
+            raise ValueError(f"No data found for symbol: {symbol}")
+        symbol_generators[symbol] = generator
+    
+    return merge_ticks(symbol_generators)
+
+
+def parse_time_arg(value):
+    """Parse a --from/--to argument given as epoch ms or a date string."""
+    return parse_timestamp_ms(int(value) if value.isdigit() else value)
+
+
+def main():
+    """Replay symbols headlessly and write the ticks to stdout as CSV."""
+    parser = argparse.ArgumentParser(description="Replay historical ticks as fast as possible.")
+    parser.add_argument("symbols", nargs="+", help="Symbols to replay")
+    parser.add_argument("--data-dir", default="data", help="Data directory")
+    parser.add_argument("--ticks-per-candle", type=int, default=600, help="Ticks generated per candle")
+    parser.add_argument("--batch-size", type=int, default=None, help="Candles per vectorized tick path batch")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible replays")
+    parser.add_argument("--from", dest="start", type=parse_time_arg, default=None,
+                        help="Replay candles from this time (epoch ms or date string)")
+    parser.add_argument("--to", dest="end", type=parse_time_arg, default=None,
+                        help="Replay candles up to this time (epoch ms or date string)")
+    parser.add_argument("--timeframe", default=None, help="Resample candles to this timeframe, e.g. 5m")
+    parser.add_argument("--correlated", nargs="?", const="", default=None, metavar="UNDERLYING",
+                        help="Derive every symbol's ticks from one simulated path of UNDERLYING "
+                             "(default: the first symbol)")
+    parser.add_argument("--quiet", action="store_true", help="Only print the tick count and throughput")
+    args = parser.parse_args()
+    
+    correlated = args.correlated
+    if correlated == "":
+        correlated = args.symbols[0]
+    
+    start = time.perf_counter()
+    count = 0
+    out = sys.stdout
+    for symbol, timestamp_ms, tick_price in replay(args.symbols, args.ticks_per_candle, args.data_dir,
+                                                   args.batch_size, args.seed, start_ms=args.start,
+                                                   end_ms=args.end, timeframe=args.timeframe,
+                                                   correlated=correlated):
+        count += 1
+        if not args.quiet:
+            out.write(f"{symbol},{timestamp_ms},{tick_price}\n")
+    
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {count} ticks in {elapsed:.2f}s ({count / elapsed:.0f} ticks/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
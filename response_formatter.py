@@ -1,22 +1,113 @@
 import copy
+import re
+
+
+PLACEHOLDER_NAMES = ("SYMBOL", "TIMESTAMP", "TICK")
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(SYMBOL|TIMESTAMP|TICK)\}\}")
 
 
 class ResponseFormatter:
     def __init__(self, template=None):
-        """Initialize response formatter with optional custom template."""
+        """
+        Initialize response formatter with optional custom template.
+        
+        The template is compiled once into a plan of builders: static parts of
+        the template are kept as they are and only the placeholder slots are
+        filled in for each tick.
+        """
         self.template = template
         self.default_template = {
             "symbol": "{{SYMBOL}}",
             "timestamp": "{{TIMESTAMP}}",
             "price": "{{TICK}}"
         }
+        template_to_use = self.template if self.template else self.default_template
+        self._plan = self._compile_node(template_to_use)
     
     def format_response(self, symbol, timestamp, tick_price):
         """Format a response using the template and provided values."""
+        if not symbol or "{" in symbol or "}" in symbol or symbol in PLACEHOLDER_NAMES:
+            # Symbols that could form new placeholders after substitution
+            # need the sequential string replacement to stay exact.
+            return self._format_uncompiled(symbol, timestamp, tick_price)
+        
+        values = (symbol, timestamp, tick_price, str(timestamp), str(tick_price))
+        return self._plan(values)
+    
+    def _format_uncompiled(self, symbol, timestamp, tick_price):
+        """Format a response by copying the template and replacing placeholders in every string."""
         template_to_use = self.template if self.template else self.default_template
         response = copy.deepcopy(template_to_use)
         return self._replace_placeholders(response, symbol, timestamp, tick_price)
     
+    def _compile_node(self, obj):
+        """Compile a template node into a builder called with the tick values."""
+        if isinstance(obj, dict):
+            entries = [(self._compile_node(key), self._compile_node(value)) for key, value in obj.items()]
+            return lambda values: {key(values): value(values) for key, value in entries}
+        elif isinstance(obj, list):
+            items = [self._compile_node(item) for item in obj]
+            return lambda values: [item(values) for item in items]
+        elif isinstance(obj, str):
+            return self._compile_string(obj)
+        else:
+            return lambda values: obj
+    
+    def _compile_string(self, text):
+        """
+        Compile a template string into a builder.
+        
+        Follows _replace_string: a string whose final text equals the timestamp
+        or price is returned as that number, so any string that could render
+        to a number is resolved per tick. A string with literal braces around
+        a symbol slot, e.g. "{{{{SYMBOL}}}}", can form a new placeholder once
+        the symbol is in, so it is left to _replace_string.
+        """
+        parts = PLACEHOLDER_PATTERN.split(text)
+        
+        if "SYMBOL" in parts[1::2] and any("{{" in part or "}}" in part for part in parts[::2]):
+            return lambda values: self._replace_string(text, values[0], values[1], values[2])
+        
+        if len(parts) == 1:
+            if not self._could_be_number(text):
+                return lambda values: text
+            return lambda values: self._coerce(text, values)
+        
+        if len(parts) == 3 and not parts[0] and not parts[2]:
+            name = parts[1]
+            if name == "TIMESTAMP":
+                return lambda values: values[1]
+            if name == "TICK":
+                return lambda values: values[1] if values[4] == values[3] else values[2]
+            return lambda values: self._coerce(values[0], values)
+        
+        slots = {"SYMBOL": 0, "TIMESTAMP": 3, "TICK": 4}
+        pieces = [(False, part) if i % 2 == 0 else (True, slots[part]) for i, part in enumerate(parts) if part]
+        
+        def build(values):
+            rendered = "".join(values[piece] if is_slot else piece for is_slot, piece in pieces)
+            return self._coerce(rendered, values)
+        
+        return build
+    
+    @staticmethod
+    def _coerce(text, values):
+        """Return the timestamp or price if the text matches its string form."""
+        if text == values[3]:
+            return values[1]
+        if text == values[4]:
+            return values[2]
+        return text
+    
+    @staticmethod
+    def _could_be_number(text):
+        """Check whether a literal string could equal str() of a timestamp or price."""
+        try:
+            float(text)
+            return True
+        except ValueError:
+            return False
+    
     def _replace_placeholders(self, obj, symbol, timestamp, tick_price):
         """Recursively replace placeholders in the template."""
         if isinstance(obj, dict):
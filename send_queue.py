@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+
+POLICIES = ("drop_oldest", "conflate", "disconnect")
+
+DEFAULT_POLICY = "drop_oldest"
+DEFAULT_MAX_MESSAGES = 1000
+DEFAULT_MAX_LAG_MS = 5000
+
+
+class SendQueueOverflow(Exception):
+    """Raised to the writer of a queue whose client fell too far behind under the disconnect policy."""
+
+
+class SendQueue:
+    def __init__(self, policy=DEFAULT_POLICY, max_messages=DEFAULT_MAX_MESSAGES, max_lag_ms=DEFAULT_MAX_LAG_MS,
+                 on_overflow=None, clock=time.monotonic):
+        """
+        Bounded outbound message queue of one client.
+        
+        Producers put messages without waiting and the client's writer task
+        sends them, so a slow socket only ever delays its own queue. What
+        happens when the client falls behind depends on the policy:
+        
+        - drop_oldest: once max_messages are pending, the oldest is dropped
+        - conflate: only the latest message per key (symbol) is kept pending
+        - disconnect: once max_messages are pending or the oldest pending
+          message is older than max_lag_ms, the queue is failed and on_overflow
+          is called to close the connection
+        
+        Args:
+            policy: One of POLICIES
+            max_messages: Upper bound on pending messages
+            max_lag_ms: Lag threshold of the disconnect policy
+            on_overflow: Called once when the disconnect policy trips
+            clock: Monotonic clock in seconds used to measure lag
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unsupported backpressure policy: {policy}. Use one of {', '.join(POLICIES)}.")
+        
+        self.policy = policy
+        self.max_messages = max(1, int(max_messages))
+        self.max_lag_ms = max_lag_ms
+        self.on_overflow = on_overflow
+        self.clock = clock
+        self._pending = OrderedDict() if policy == "conflate" else deque()
+        self._ready = asyncio.Event()
+        self._finished = False
+        self._error = None
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.max_depth = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_seen_ms = 0.0
+    
+    def put(self, message, key=None):
+        """
+        Queue a message without waiting.
+        
+        Args:
+            key: Conflation key, e.g. the symbol; messages with the same key
+                replace each other under the conflate policy
+        
+        Returns:
+            False if the queue is finished or the client was just disconnected
+            for lagging, True otherwise
+        """
+        if self._finished:
+            return False
+        
+        now = self.clock()
+        pending = self._pending
+        
+        if self.policy == "conflate":
+            if key in pending:
+                del pending[key]
+                self.conflated += 1
+            elif len(pending) >= self.max_messages:
+                pending.popitem(last=False)
+                self.dropped += 1
+            pending[key] = (now, message, key)
+        elif self.policy == "drop_oldest":
+            if len(pending) >= self.max_messages:
+                pending.popleft()
+                self.dropped += 1
+            pending.append((now, message, key))
+        else:
+            if len(pending) >= self.max_messages or self._lag_ms(now) > self.max_lag_ms:
+                self._overflow()
+                return False
+            pending.append((now, message, key))
+        
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(pending))
+        self._ready.set()
+        return True
+    
+    def finish(self, error=None):
+        """
+        Stop accepting messages. The writer gets the pending messages, then None.
+        
+        With an error the pending messages are discarded and get() raises it.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        self._error = error
+        if error is not None:
+            self.dropped += len(self._pending)
+            self._pending.clear()
+        self._ready.set()
+    
+    async def get(self):
+        """Wait for the next message; returns None once the queue is finished and empty."""
+        item = await self.get_item()
+        return item[0] if item is not None else None
+    
+    async def get_item(self):
+        """Wait for the next (message, key) pair; returns None once the queue is finished and empty."""
+        while not self._pending:
+            if self._finished:
+                if self._error is not None:
+                    raise self._error
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        
+        if self.policy == "conflate":
+            enqueued_at, message, key = self._pending.popitem(last=False)[1]
+        else:
+            enqueued_at, message, key = self._pending.popleft()
+        
+        self.last_lag_ms = (self.clock() - enqueued_at) * 1000.0
+        self.max_lag_seen_ms = max(self.max_lag_seen_ms, self.last_lag_ms)
+        self.sent += 1
+        return (message, key)
+    
+    def __len__(self):
+        return len(self._pending)
+    
+    def lag_ms(self):
+        """Age in ms of the oldest pending message, 0 when nothing is pending."""
+        return self._lag_ms(self.clock())
+    
+    def stats(self):
+        """Return depth, delivery and lag counters."""
+        return {
+            "policy": self.policy,
+            "depth": len(self._pending),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "lag_ms": self.lag_ms(),
+            "last_lag_ms": self.last_lag_ms,
+            "max_lag_ms": self.max_lag_seen_ms
+        }
+    
+    def _lag_ms(self, now):
+        if not self._pending:
+            return 0.0
+        if self.policy == "conflate":
+            # Replaced messages are moved to the end, so entries stay in enqueue order.
+            oldest = next(iter(self._pending.values()))[0]
+        else:
+            oldest = self._pending[0][0]
+        return (now - oldest) * 1000.0
+    
+    def _overflow(self):
+        """Fail the queue and tell the owner the client has to be disconnected."""
+        self.finish(SendQueueOverflow(f"Client lagged more than {self.max_messages} messages or {self.max_lag_ms} ms"))
+        if self.on_overflow is not None:
+            self.on_overflow()
@@ -0,0 +1,189 @@
+import json
+import struct
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+if orjson is not None:
+    def dumps(obj):
+        """Serialize obj to a JSON string with orjson."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(text):
+        """Parse a JSON string with orjson."""
+        return orjson.loads(text)
+else:
+    def dumps(obj):
+        """Serialize obj to a JSON string with the standard library."""
+        return json.dumps(obj)
+    
+    def loads(text):
+        """Parse a JSON string with the standard library."""
+        return json.loads(text)
+
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+# symbol id (uint32), epoch ms (int64), price (float64), little-endian
+BINARY_TICK_RECORD = struct.Struct("<Iqd")
+
+
+class JsonTickEncoder:
+    name = "json"
+    
+    def __init__(self, formatter, template_key, metrics=None):
+        """
+        Encode ticks as JSON text frames using the client's response template.
+        
+        Args:
+            formatter: ResponseFormatter for the client's template
+            template_key: Canonical form of the template, so clients with the same
+                template can share encoded messages
+            metrics: TickMetrics to record sampled formatting and serialization times in
+        """
+        self.formatter = formatter
+        self.template_key = template_key
+        self.metrics = metrics
+    
+    def message_key(self, symbol):
+        """Key identifying the encoded message for a symbol; equal keys mean equal bytes."""
+        return (self.name, self.template_key)
+    
+    def add_symbols(self, symbols):
+        """Prepare for symbols added mid-stream. Returns True if the client has to be told; never for JSON."""
+        return False
+    
+    def encode(self, symbol, timestamp_ms, tick_price):
+        """Encode a single tick as one message."""
+        if self.metrics is not None and self.metrics.sample():
+            return self._timed_dumps(lambda: self.formatter.format_response(symbol, timestamp_ms, tick_price))
+        return self._dumps(self.formatter.format_response(symbol, timestamp_ms, tick_price))
+    
+    def encode_batch(self, ticks):
+        """Encode (symbol, timestamp_ms, tick_price) ticks as one message."""
+        if self.metrics is not None and self.metrics.sample():
+            return self._timed_dumps(lambda: [self.formatter.format_response(*tick) for tick in ticks])
+        return self._dumps([self.formatter.format_response(*tick) for tick in ticks])
+    
+    def encode_bar(self, bar):
+        """Encode a bar message as is; response templates only apply to ticks."""
+        return self._dumps(bar)
+    
+    def _timed_dumps(self, format_ticks):
+        """Format and serialize, recording the time of each stage."""
+        start = time.perf_counter()
+        response = format_ticks()
+        formatted = time.perf_counter()
+        message = self._dumps(response)
+        self.metrics.format.observe(formatted - start)
+        self.metrics.serialize.observe(time.perf_counter() - formatted)
+        return message
+    
+    def _dumps(self, obj):
+        return dumps(obj)
+
+
+class MsgpackTickEncoder(JsonTickEncoder):
+    name = "msgpack"
+    
+    def _dumps(self, obj):
+        return msgpack.packb(obj)
+
+
+class BinaryTickEncoder:
+    name = "binary"
+    
+    def __init__(self, symbol_ids, metrics=None):
+        """
+        Encode ticks as fixed 20-byte records: symbol id, epoch ms and price.
+        
+        Args:
+            symbol_ids: Mapping of symbol to the uint32 id announced to the client
+            metrics: TickMetrics to record sampled serialization times in; there
+                is no formatting stage
+        """
+        self.symbol_ids = symbol_ids
+        self.metrics = metrics
+    
+    def message_key(self, symbol):
+        """Key identifying the encoded message for a symbol; equal keys mean equal bytes."""
+        return (self.name, self.symbol_ids[symbol])
+    
+    def add_symbols(self, symbols):
+        """
+        Number symbols added mid-stream after the existing ones.
+        
+        Ids are never reused, so records already on the wire keep their meaning.
+        Returns True if new ids were assigned and have to be announced.
+        """
+        added = False
+        for symbol in symbols:
+            if symbol not in self.symbol_ids:
+                self.symbol_ids[symbol] = len(self.symbol_ids)
+                added = True
+        return added
+    
+    def encode(self, symbol, timestamp_ms, tick_price):
+        """Encode a single tick as one 20-byte record."""
+        if self.metrics is not None and self.metrics.sample():
+            start = time.perf_counter()
+            message = BINARY_TICK_RECORD.pack(self.symbol_ids[symbol], timestamp_ms, tick_price)
+            self.metrics.serialize.observe(time.perf_counter() - start)
+            return message
+        return BINARY_TICK_RECORD.pack(self.symbol_ids[symbol], timestamp_ms, tick_price)
+    
+    def encode_batch(self, ticks):
+        """Encode (symbol, timestamp_ms, tick_price) ticks as concatenated records."""
+        if self.metrics is not None and self.metrics.sample():
+            start = time.perf_counter()
+            message = self._pack_batch(ticks)
+            self.metrics.serialize.observe(time.perf_counter() - start)
+            return message
+        return self._pack_batch(ticks)
+    
+    def encode_bar(self, bar):
+        """Encode a bar message as a JSON text frame, like the symbol id announcements."""
+        return dumps(bar)
+    
+    def _pack_batch(self, ticks):
+        pack = BINARY_TICK_RECORD.pack
+        symbol_ids = self.symbol_ids
+        return b"".join(pack(symbol_ids[symbol], timestamp_ms, tick_price)
+                        for symbol, timestamp_ms, tick_price in ticks)
+
+
+def available_encodings():
+    """Return the wire encodings that can be negotiated in this process."""
+    encodings = ["json", "binary"]
+    if msgpack is not None:
+        encodings.append("msgpack")
+    return encodings
+
+
+def create_tick_encoder(encoding, formatter, template_key, symbols, metrics=None):
+    """
+    Build the tick encoder for a negotiated wire encoding.
+    
+    Args:
+        encoding: "json", "msgpack" or "binary"
+        symbols: Subscribed symbols, numbered in order for the binary encoding
+        metrics: TickMetrics to record sampled stage times in
+    """
+    if encoding not in available_encodings():
+        raise ValueError(f"Unsupported encoding: {encoding}. Use one of {', '.join(available_encodings())}.")
+    
+    if encoding == "binary":
+        return BinaryTickEncoder({symbol: i for i, symbol in enumerate(symbols)}, metrics)
+    if encoding == "msgpack":
+        return MsgpackTickEncoder(formatter, template_key, metrics)
+    return JsonTickEncoder(formatter, template_key, metrics)
+
@@ -0,0 +1,317 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from candle_file import BINARY_EXTENSION, read_candle_file
+from candle_store import CandleStore
+
+
+TIMEFRAMES = ("1m", "5m", "15m")
+DATA_EXTENSIONS = (".json", BINARY_EXTENSION)
+
+
+class CatalogFile:
+    def __init__(self, base_name, symbol, timeframe, expiry=None):
+        """
+        One data set in the catalog, backed by a JSON file, a binary file or both.
+        
+        Args:
+            base_name: File name without extension, e.g. OPT_BANKNIFTYFUT_28102025_1m
+            symbol: Symbol the file belongs to, e.g. OPT_BANKNIFTYFUT
+            timeframe: Candle timeframe from the file name, e.g. 1m
+            expiry: Expiry date of an options file, None for regular symbols
+        """
+        self.base_name = base_name
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.expiry = expiry
+        self.paths = {}
+    
+    @property
+    def signature(self):
+        """
+        (path, mtime_ns, size) of the file to load: the binary file unless the JSON file is newer.
+        
+        Stated on every call, so files edited in place are picked up without a rescan.
+        """
+        versions = {}
+        for extension, path in self.paths.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            versions[extension] = (path, stat.st_mtime_ns, stat.st_size)
+        
+        binary = versions.get(BINARY_EXTENSION)
+        json_version = versions.get(".json")
+        if binary is not None and (json_version is None or binary[1] >= json_version[1]):
+            return binary
+        return json_version
+    
+    @property
+    def path(self):
+        """Path of the file to load, None if it has disappeared."""
+        signature = self.signature
+        return signature[0] if signature else None
+    
+    @property
+    def expiry_end_ms(self):
+        """Epoch milliseconds of the end of the expiry day, after which the file has no candles; None without expiry."""
+        if self.expiry is None:
+            return None
+        return int((self.expiry + timedelta(days=1)).timestamp() * 1000)
+
+
+class SymbolCatalog:
+    def __init__(self, data_dir="data", auto_refresh=True):
+        """
+        Index of the data directory: symbol -> timeframes -> expiries -> files.
+        
+        The directory is scanned once when the catalog is built. After that it
+        is rescanned only when its modification time has changed, i.e. when
+        files were added, removed or replaced. With auto_refresh every lookup
+        checks the directory first; otherwise the owner calls refresh(), e.g.
+        from a polling task off the event loop. Row counts and
+        time ranges are read on first request and kept until the file changes:
+        from the header and first and last timestamps of binary files, or by
+        parsing JSON files.
+        """
+        self.data_dir = data_dir
+        self.auto_refresh = auto_refresh
+        self.scans = 0
+        self._dir_mtime = None
+        self._symbols = {}
+        self._playback = {}
+        self._metadata = {}
+        self._parsed_names = {}
+        self._expiries = {}
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+    
+    def refresh(self, force=False):
+        """Rescan the directory if it changed since the last scan. Returns True if it was rescanned."""
+        try:
+            dir_mtime = os.stat(self.data_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        
+        with self._lock:
+            if not force and dir_mtime == self._dir_mtime:
+                return False
+            self._symbols = self._scan()
+            self._playback = {symbol: self._playback_files(files) for symbol, files in self._symbols.items()}
+            self._dir_mtime = dir_mtime
+            self.scans += 1
+            return True
+    
+    def _scan(self):
+        """List the data files and group them by symbol."""
+        files = {}
+        try:
+            entries = list(os.scandir(self.data_dir))
+        except OSError:
+            entries = []
+        
+        for entry in entries:
+            name = entry.name
+            dot = name.rfind(".")
+            extension = name[dot:]
+            if dot < 0 or extension not in DATA_EXTENSIONS:
+                continue
+            base_name = name[:dot]
+            
+            catalog_file = files.get(base_name)
+            if catalog_file is None:
+                if base_name not in self._parsed_names:
+                    self._parsed_names[base_name] = self._parse_name(base_name)
+                parsed = self._parsed_names[base_name]
+                if parsed is None:
+                    continue
+                catalog_file = CatalogFile(base_name, *parsed)
+                files[base_name] = catalog_file
+            catalog_file.paths[extension] = entry.path
+        
+        symbols = {}
+        for catalog_file in files.values():
+            if catalog_file.timeframe in TIMEFRAMES:
+                symbols.setdefault(catalog_file.symbol, []).append(catalog_file)
+        return symbols
+    
+    def _parse_name(self, base_name):
+        """
+        Read (symbol, timeframe, expiry) from SYMBOL_TIMEFRAME or OPT_SYMBOL_EXPIRY_TIMEFRAME.
+        
+        Regular symbols may contain underscores, e.g. BAJAJ_AUTO_1m: only the
+        part after the last underscore is the timeframe. Returns None for names
+        that are not data files. Results are kept across
+        scans, so a rescan only parses names it has not seen.
+        """
+        parts = base_name.split("_")
+        
+        if parts[0] == "OPT":
+            if len(parts) < 4:
+                return None
+            expiry = self._parse_expiry(parts[2])
+            if expiry is None:
+                return None
+            return (f"OPT_{parts[1]}", parts[3], expiry)
+        
+        symbol, _, timeframe = base_name.rpartition("_")
+        if not symbol or timeframe not in TIMEFRAMES:
+            return None
+        return (symbol, timeframe, None)
+    
+    def _parse_expiry(self, expiry_str):
+        """Parse a DDMMYYYY expiry, memoized since many files share an expiry."""
+        if expiry_str not in self._expiries:
+            try:
+                self._expiries[expiry_str] = datetime.strptime(expiry_str, "%d%m%Y")
+            except ValueError:
+                self._expiries[expiry_str] = None
+        return self._expiries[expiry_str]
+    
+    def symbols(self):
+        """Return every symbol that has playable data."""
+        if self.auto_refresh:
+            self.refresh()
+        return sorted(self._playback)
+    
+    def resolve(self, symbol):
+        """Return the data file paths backing a symbol, in playback order."""
+        paths = [catalog_file.path for catalog_file in self.playback_files(symbol)]
+        return [path for path in paths if path is not None]
+    
+    def playback_files(self, symbol):
+        """Return the CatalogFiles backing a symbol, in playback order."""
+        if self.auto_refresh:
+            self.refresh()
+        return self._playback.get(symbol, [])
+    
+    def timeframe(self, symbol):
+        """
+        Return the timeframe a symbol plays at, None if it is unknown.
+        
+        This is the finest timeframe of its data, or for an options chain
+        whose expiries differ, the coarsest of the expiries' timeframes.
+        Coarser timeframes are derived from it by resampling.
+        """
+        files = self.playback_files(symbol)
+        if not files:
+            return None
+        return max((catalog_file.timeframe for catalog_file in files), key=TIMEFRAMES.index)
+    
+    def _playback_files(self, files):
+        """
+        Pick the files a symbol plays from.
+        
+        Regular symbols play the finest available timeframe. Options chains play
+        every expiry in date order, each from its finest available timeframe.
+        """
+        if files[0].expiry is None:
+            return [min(files, key=lambda f: TIMEFRAMES.index(f.timeframe))]
+        
+        by_expiry = {}
+        for catalog_file in files:
+            current = by_expiry.get(catalog_file.expiry)
+            if current is None or TIMEFRAMES.index(catalog_file.timeframe) < TIMEFRAMES.index(current.timeframe):
+                by_expiry[catalog_file.expiry] = catalog_file
+        return [by_expiry[expiry] for expiry in sorted(by_expiry)]
+    
+    def metadata(self, catalog_file, load=None):
+        """
+        Return (row_count, first_ms, last_ms) of a file's candles.
+        
+        Cached per file signature, so a replaced file is read again.
+        
+        Args:
+            catalog_file: CatalogFile to describe
+            load: Optional function returning the CandleStore of a file path, used
+                instead of the catalog's own read so that a caller about to load
+                the file anyway parses a JSON file only once
+        """
+        signature = catalog_file.signature
+        if signature is None:
+            return (0, None, None)
+        cached = self.known_metadata(signature)
+        if cached is not None:
+            return cached
+        
+        try:
+            metadata = self._read_metadata(signature[0], load)
+        except Exception as e:
+            print(f"Error reading metadata of {signature[0]}: {e}")
+            metadata = (0, None, None)
+        self._metadata[signature[0]] = (signature, metadata)
+        return metadata
+    
+    def known_metadata(self, signature):
+        """
+        Return (row_count, first_ms, last_ms) of a file version if already known, else None; never reads the file.
+        
+        Args:
+            signature: (path, mtime_ns, size) of the file
+        """
+        cached = self._metadata.get(signature[0])
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        return None
+    
+    def record_metadata(self, signature, candles):
+        """
+        Remember the metadata of a file whose candles were loaded outside the catalog.
+        
+        Args:
+            signature: (path, mtime_ns, size) of the file when it was loaded
+            candles: The file's CandleStore
+        """
+        if not candles:
+            metadata = (0, None, None)
+        else:
+            metadata = (len(candles), int(candles.timestamp[0]), int(candles.timestamp[-1]))
+        self._metadata[signature[0]] = (signature, metadata)
+    
+    def _read_metadata(self, file_path, load=None):
+        """Read the row count and first and last timestamps of a data file."""
+        if load is not None:
+            candles = load(file_path)
+            row_count = len(candles)
+        elif file_path.endswith(BINARY_EXTENSION):
+            candles = read_candle_file(file_path)
+            row_count = len(candles)
+        else:
+            with open(file_path, 'r') as f:
+                records = json.load(f)
+            row_count = len(records)
+            candles = CandleStore.from_records(records[:1] + records[-1:])
+        
+        if not row_count:
+            return (0, None, None)
+        return (row_count, int(candles.timestamp[0]), int(candles.timestamp[-1]))
+    
+    def describe(self, symbol):
+        """Return a symbol's timeframes, expiries, files, row count and time range, or None if unknown."""
+        files = self.playback_files(symbol)
+        if not files:
+            return None
+        
+        rows = 0
+        first_ms = None
+        last_ms = None
+        for catalog_file in files:
+            row_count, start_ms, end_ms = self.metadata(catalog_file)
+            rows += row_count
+            if start_ms is not None:
+                first_ms = start_ms if first_ms is None else min(first_ms, start_ms)
+                last_ms = end_ms if last_ms is None else max(last_ms, end_ms)
+        
+        description = {
+            "symbol": symbol,
+            "timeframes": sorted({f.timeframe for f in self._symbols.get(symbol, [])}, key=TIMEFRAMES.index),
+            "files": len(files),
+            "rows": rows,
+            "from": first_ms,
+            "to": last_ms
+        }
+        if symbol.startswith("OPT_"):
+            description["expiries"] = [f.expiry.strftime("%Y-%m-%d") for f in files]
+        return description
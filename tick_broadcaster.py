@@ -0,0 +1,249 @@
+import asyncio
+import time
+from datetime import datetime
+from bar_builder import bar_key
+
+
+class TickStream:
+    def __init__(self, key, generator, metrics=None):
+        """
+        A single tick generator whose ticks are fanned out to every subscriber.
+        
+        Args:
+            key: (symbol, tick_frequency_ms, override_time, time_range, timeframe) identifying the stream
+            generator: TickGenerator shared by all subscribers
+            metrics: TickMetrics to count generated ticks and sample generation time in
+        """
+        self.key = key
+        self.metrics = metrics
+        self.symbol, self.tick_frequency_ms, self.override_time, self.time_range, self.timeframe = key
+        self.generator = generator
+        self.subscribers = {}
+        self.finished = asyncio.Event()
+        self.job = None
+        self.ticks_queued = 0
+        self.ticks_dropped = 0
+    
+    def add_subscriber(self, websocket, encoder, send_queue, bars=None, ticks=True):
+        """
+        Attach a socket with the tick encoder for its template and wire encoding, and its send queue.
+        
+        Args:
+            bars: The subscriber's BarBuilder when it asked for bars, else None
+            ticks: False for bar-only subscribers, which are sent no ticks
+        """
+        self.subscribers[websocket] = (encoder, send_queue, bars, ticks)
+    
+    def remove_subscriber(self, websocket):
+        """Detach a socket. The stream stops once nobody is subscribed."""
+        self.subscribers.pop(websocket, None)
+    
+    def step(self, now):
+        """
+        Produce and publish one tick on a scheduler step.
+        
+        Returns False once data runs out or everyone has left, which stops the job.
+        """
+        generator = self.generator
+        if not self.subscribers or not generator.has_more_data():
+            self.finish_bars()
+            self.finished.set()
+            return False
+        
+        if generator.should_advance_candle(now):
+            # While the next candles are still loading the stream pauses instead of blocking the event loop.
+            if generator.pending_load() is not None:
+                return True
+            generator.advance_candle()
+        
+        if generator.has_more_data():
+            metrics = self.metrics
+            if metrics is not None and metrics.sample():
+                start = time.perf_counter()
+                tick_price = generator.generate_tick()
+                metrics.generate.observe(time.perf_counter() - start)
+            else:
+                tick_price = generator.generate_tick()
+            if tick_price is not None:
+                if metrics is not None:
+                    metrics.ticks_generated.labels(self.symbol).inc()
+                if self.override_time:
+                    timestamp_ms = generator.get_current_timestamp_ms()
+                else:
+                    timestamp_ms = int(datetime.now().timestamp() * 1000)
+                self.publish(timestamp_ms, tick_price, generator.current_candle_ms, generator.current_candle_volume)
+        
+        return True
+    
+    def publish(self, timestamp_ms, tick_price, candle_ms=None, candle_volume=0.0):
+        """
+        Encode the tick once per distinct template and encoding and queue it for every subscriber.
+        
+        Each subscriber's send queue applies its own backpressure policy, so a
+        slow client never stalls the stream. Subscribers whose queue refuses
+        the tick (disconnected for lagging) are detached. Subscribers that asked
+        for bars feed the tick to their BarBuilder and get its bar messages.
+        """
+        messages = {}
+        
+        for websocket, (encoder, send_queue, bars, ticks) in list(self.subscribers.items()):
+            if ticks:
+                message_key = encoder.message_key(self.symbol)
+                message = messages.get(message_key)
+                if message is None:
+                    message = encoder.encode(self.symbol, timestamp_ms, tick_price)
+                    messages[message_key] = message
+                
+                if send_queue.put(message, self.symbol):
+                    self.ticks_queued += 1
+                else:
+                    self.ticks_dropped += 1
+                    self.remove_subscriber(websocket)
+                    continue
+            
+            if bars is not None:
+                for bar in bars.add_tick(self.symbol, timestamp_ms, tick_price, candle_ms, candle_volume):
+                    if not send_queue.put(encoder.encode_bar(bar), bar_key(bar)):
+                        self.remove_subscriber(websocket)
+                        break
+    
+    def finish_bars(self):
+        """Send every subscriber that asked for bars the bar in progress once the data runs out."""
+        for encoder, send_queue, bars, ticks in list(self.subscribers.values()):
+            bar = bars.finish(self.symbol) if bars is not None else None
+            if bar is not None:
+                send_queue.put(encoder.encode_bar(bar), bar_key(bar))
+
+
+class TickBroadcaster:
+    def __init__(self, scheduler, metrics=None):
+        """
+        Registry of shared tick streams keyed by symbol, tick frequency, time mode, time range and timeframe.
+        
+        streams holds the stream new subscribers join for each key. A stream
+        moved to a key that is already taken runs outside it, so running_streams
+        holds every running stream, for the stats.
+        
+        Args:
+            scheduler: TickScheduler that drives every stream
+            metrics: TickMetrics passed on to every stream
+        """
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.streams = {}
+        self.running_streams = set()
+    
+    def subscribe(self, websocket, symbol, tick_frequency_ms, override_time, encoder, send_queue,
+                  generator_factory, time_range=(None, None), timeframe=None, bars=None, ticks=True):
+        """
+        Attach a socket to the stream for a symbol, starting the stream if needed.
+        
+        Args:
+            generator_factory: Callable returning a new TickGenerator for the symbol,
+                or None if there is no data. Only called when no stream is running.
+            time_range: (start_ms, end_ms) the generator plays, either may be None
+            timeframe: Timeframe the generator's candles are resampled to, None for the data's own
+            bars: BarBuilder of a subscriber that asked for bars
+            ticks: False for a bar-only subscriber
+        
+        Returns:
+            The TickStream, or None if the symbol has no data
+        """
+        stream = self.running_stream(symbol, tick_frequency_ms, override_time, time_range, timeframe)
+        
+        if stream is None:
+            key = (symbol, tick_frequency_ms, override_time, tuple(time_range), timeframe)
+            generator = generator_factory()
+            if generator is None:
+                return None
+            stream = TickStream(key, generator, self.metrics)
+            stream.add_subscriber(websocket, encoder, send_queue, bars, ticks)
+            self._start(stream)
+        else:
+            stream.add_subscriber(websocket, encoder, send_queue, bars, ticks)
+        
+        return stream
+    
+    def running_stream(self, symbol, tick_frequency_ms, override_time, time_range=(None, None), timeframe=None):
+        """Return the unfinished stream a subscribe with these settings would join, or None."""
+        stream = self.streams.get((symbol, tick_frequency_ms, override_time, tuple(time_range), timeframe))
+        if stream is None or stream.finished.is_set():
+            return None
+        return stream
+    
+    def retune(self, stream, tick_frequency_ms, ticks_per_candle):
+        """
+        Switch a whole stream to a new tick frequency, keeping its generator and position.
+        
+        Used when a stream's only subscriber changes its frequency. The current
+        candle keeps its tick path; the new ticks per candle apply from the next.
+        """
+        if self.streams.get(stream.key) is stream:
+            del self.streams[stream.key]
+        stream.job.cancel()
+        stream.key = (stream.symbol, tick_frequency_ms) + stream.key[2:]
+        stream.tick_frequency_ms = tick_frequency_ms
+        stream.generator.set_ticks_per_candle(ticks_per_candle)
+        self._start(stream)
+        return stream
+    
+    def branch(self, websocket, stream, tick_frequency_ms, generator):
+        """
+        Move one subscriber of a shared stream to a new stream at another tick frequency.
+        
+        The generator must already continue from the old stream's position (see
+        TickGenerator.follow), so the subscriber's playback neither restarts nor
+        jumps. Its encoder, send queue and bar builder move along.
+        
+        Returns:
+            The new TickStream
+        """
+        key = (stream.symbol, tick_frequency_ms) + stream.key[2:]
+        branched = TickStream(key, generator, self.metrics)
+        branched.add_subscriber(websocket, *stream.subscribers[websocket])
+        stream.remove_subscriber(websocket)
+        self._start(branched)
+        return branched
+    
+    def _start(self, stream):
+        """
+        Schedule a stream's steps and register it for others to join.
+        
+        A stream at a moved position is not registered when a stream with the
+        same settings is already running; it then serves only its own subscribers.
+        """
+        if self.running_stream(*stream.key) is None:
+            self.streams[stream.key] = stream
+        self.running_streams.add(stream)
+        stream.job = self.scheduler.schedule(stream.tick_frequency_ms / 1000.0,
+                                             lambda now: self._step(stream, now))
+    
+    def unsubscribe(self, websocket, streams):
+        """Detach a socket from the given streams."""
+        for stream in streams:
+            stream.remove_subscriber(websocket)
+    
+    def stats(self):
+        """Return per-stream subscriber and delivery counters."""
+        return [
+            {
+                "symbol": stream.symbol,
+                "tick_frequency_ms": stream.tick_frequency_ms,
+                "override_time": stream.override_time,
+                "time_range": list(stream.time_range),
+                "timeframe": stream.timeframe,
+                "subscribers": len(stream.subscribers),
+                "ticks_queued": stream.ticks_queued,
+                "ticks_dropped": stream.ticks_dropped
+            }
+            for stream in self.running_streams
+        ]
+    
+    def _step(self, stream, now):
+        """Run a stream's step, forgetting the stream once it finishes."""
+        keep = stream.step(now)
+        if keep is False:
+            self.running_streams.discard(stream)
+            if self.streams.get(stream.key) is stream:
+                del self.streams[stream.key]
+        return keep
@@ -1,19 +1,39 @@
 import random
-from datetime import datetime, timedelta
+import time
+import numpy as np
+from datetime import datetime
+from candle_stream import CandleWindow
+from tick_paths import generate_tick_paths
 
 
 class TickGenerator:
-    def __init__(self, candles, ticks_per_candle=10):
+    def __init__(self, candles, ticks_per_candle=10, batch_size=None, seed=None, clock=time.monotonic,
+                 replay=False, paths=None):
         """
         Initialize tick generator with candle data.
         
         Args:
-            candles: List of candle dictionaries with open, high, low, close, datetime
+            candles: CandleStore with open, high, low, close and timestamp columns,
+                or an iterable of CandleStore chunks in playback order, read
+                through a window as playback reaches them. Stores are only
+                read, so they can be shared between generators.
             ticks_per_candle: Number of ticks to generate per candle before advancing
+            batch_size: When set, precompute tick paths for this many candles at a
+                time with the vectorized generator instead of one candle at a time
+            seed: Seed for the price noise, for reproducible tick paths
+            clock: Monotonic clock in seconds that candle boundaries are measured on.
+                Should match the clock of the scheduler driving this generator.
+            replay: Advance candles after exactly ticks_per_candle ticks instead of on
+                wall-clock boundaries, for accelerated replay
+            paths: CorrelatedPaths shared with the generators of related symbols,
+                to derive the tick paths from one underlying path instead of
+                drawing independent noise. Paths are then computed in blocks of
+                batch_size candles, or the block size of paths.
         """
-        self.candles = candles
+        self.window = CandleWindow(candles)
         self.current_candle_index = 0
-        self.current_candle = None
+        self.current_candle_ms = None
+        self.current_candle_volume = 0.0
         self.ticks_per_candle = max(4, ticks_per_candle)
         self.current_tick_count = 0
         self.tick_interval_seconds = 0
@@ -21,24 +41,35 @@ class TickGenerator:
         self.sequence_index = 0
         self.candle_duration_seconds = 60
         self.next_candle_boundary = None
+        self.batch_size = batch_size
+        self.batch_start = 0
+        self.batch_paths = None
+        self.batch_timestamps = None
+        self.batch_volumes = None
+        self._random = random.Random(seed)
+        self._rng = np.random.default_rng(seed)
+        self.clock = clock
+        self.replay = replay
+        self.paths = paths
         
-        if self.candles:
-            self.current_candle = self.candles[0]
+        if self.window.has(0):
             self._calculate_tick_interval()
             self._generate_tick_sequence()
-            self._calculate_next_boundary()
+            if not self.replay:
+                self._calculate_next_boundary()
     
     def _calculate_tick_interval(self):
         """Calculate the time interval between ticks based on candle timeframe."""
-        if len(self.candles) >= 2:
-            self.candle_duration_seconds = (self.candles[1]['datetime'] - self.candles[0]['datetime']).total_seconds()
+        first = self.window.view(0, 2)
+        if len(first) >= 2:
+            self.candle_duration_seconds = int(first.timestamp[1] - first.timestamp[0]) / 1000.0
         else:
             self.candle_duration_seconds = 60
         
         self.tick_interval_seconds = self.candle_duration_seconds / self.ticks_per_candle
     
     def _calculate_next_boundary(self):
-        """Calculate the next candle boundary based on wall-clock time."""
+        """Calculate the next candle boundary, aligned to wall-clock time but kept on the monotonic clock."""
         now = datetime.now()
         
         if self.candle_duration_seconds == 60:
@@ -55,18 +86,26 @@ class TickGenerator:
         else:
             seconds_to_boundary = self.candle_duration_seconds
         
-        self.next_candle_boundary = now + timedelta(seconds=seconds_to_boundary)
+        self.next_candle_boundary = self.clock() + seconds_to_boundary
     
     def _generate_tick_sequence(self):
         """Generate a realistic tick sequence with gradual price movement."""
-        if not self.current_candle:
+        index = self.current_candle_index
+        if not self.window.has(index):
             self.tick_sequence = []
             return
         
-        open_price = self.current_candle['open']
-        high_price = self.current_candle['high']
-        low_price = self.current_candle['low']
-        close_price = self.current_candle['close']
+        if self.batch_size or self.paths is not None:
+            self._take_batch_sequence(index)
+            return
+        
+        candles, offset = self.window.locate(index)
+        self.current_candle_ms = int(candles.timestamp[offset])
+        self.current_candle_volume = float(candles.volume[offset])
+        open_price = float(candles.open[offset])
+        high_price = float(candles.high[offset])
+        low_price = float(candles.low[offset])
+        close_price = float(candles.close[offset])
         
         sequence = [open_price]
         
@@ -111,7 +150,7 @@ class TickGenerator:
                     progress = (j + 1) / segment_length
                     base_price = sequence[-1] + (target_price - sequence[-1]) * progress
                     
-                    noise_factor = random.uniform(-0.3, 0.3)
+                    noise_factor = self._random.uniform(-0.3, 0.3)
                     noise = tick_size * noise_factor
                     current_price = base_price + noise
                     current_price = max(low_price, min(high_price, current_price))
@@ -126,24 +165,117 @@ class TickGenerator:
         self.tick_sequence = [round(p, 2) for p in sequence[:self.ticks_per_candle]]
         self.sequence_index = 0
     
+    def _take_batch_sequence(self, index):
+        """Use the precomputed path for a candle, generating the next block if needed."""
+        if self.batch_paths is None or not self.batch_start <= index < self.batch_start + len(self.batch_paths):
+            if self.paths is not None:
+                block = self.window.view(index, self.batch_size or self.paths.block_size)
+                self.batch_paths = self.paths.generate(block, self.ticks_per_candle, self._rng)
+            else:
+                block = self.window.view(index, self.batch_size)
+                self.batch_paths = generate_tick_paths(
+                    block.open,
+                    block.high,
+                    block.low,
+                    block.close,
+                    self.ticks_per_candle,
+                    self._rng
+                )
+            self.batch_timestamps = block.timestamp
+            self.batch_volumes = block.volume
+            self.batch_start = index
+        
+        self.current_candle_ms = int(self.batch_timestamps[index - self.batch_start])
+        self.current_candle_volume = float(self.batch_volumes[index - self.batch_start])
+        self.tick_sequence = self.batch_paths[index - self.batch_start].tolist()
+        self.sequence_index = 0
+    
+    def set_ticks_per_candle(self, ticks_per_candle):
+        """
+        Change the number of ticks per candle, e.g. when the client changes its tick frequency.
+        
+        The current candle keeps its tick sequence and its elapsed candle time;
+        the new count applies from the next candle.
+        """
+        ticks_per_candle = max(4, ticks_per_candle)
+        if ticks_per_candle == self.ticks_per_candle:
+            return
+        
+        self.current_tick_count = self.current_tick_count * ticks_per_candle // self.ticks_per_candle
+        self.ticks_per_candle = ticks_per_candle
+        self.tick_interval_seconds = self.candle_duration_seconds / self.ticks_per_candle
+        self.batch_paths = None
+    
+    def follow(self, other):
+        """
+        Continue from another generator's position, e.g. the same stream at another tick frequency.
+        
+        This generator must start at the other's current candle, i.e. be built
+        with start_ms at its current_candle_ms. The elapsed part of the candle
+        and the wall-clock candle boundary carry over, scaled to this
+        generator's ticks per candle.
+        """
+        self.current_tick_count = other.current_tick_count * self.ticks_per_candle // other.ticks_per_candle
+        if self.tick_sequence:
+            self.sequence_index = self.current_tick_count % len(self.tick_sequence)
+        self.candle_duration_seconds = other.candle_duration_seconds
+        self.tick_interval_seconds = self.candle_duration_seconds / self.ticks_per_candle
+        self.next_candle_boundary = other.next_candle_boundary
+    
+    def pending_load(self):
+        """
+        Return the future of a background candle load that the next advance_candle would wait on, or None.
+        
+        Lets an event loop wait for a chunk or expiry file that is still being
+        loaded instead of blocking in advance_candle.
+        """
+        index = self.current_candle_index + 1
+        # advance_candle reads the next candle and the one after it for the candle duration.
+        end = index + 2
+        if (self.batch_size or self.paths is not None) and (
+                self.batch_paths is None or not self.batch_start <= index < self.batch_start + len(self.batch_paths)):
+            if self.paths is not None:
+                future = self.paths.pending_load()
+                if future is not None:
+                    return future
+            end = max(end, index + (self.batch_size or self.paths.block_size))
+        return self.window.pending_load(end)
+    
     def has_more_data(self):
         """Check if there are more candles to process."""
-        return self.current_candle_index < len(self.candles)
+        return self.window.has(self.current_candle_index)
     
-    def should_advance_candle(self):
-        """Check if we've reached the next candle boundary."""
+    def should_advance_candle(self, now=None):
+        """
+        Check if we've reached the next candle boundary.
+        
+        In replay mode the boundary is reached once every tick of the candle has
+        been generated.
+        
+        Args:
+            now: Current time on the generator's clock, e.g. the scheduler step time.
+                Read from the clock when not given.
+        """
+        if self.replay:
+            return self.current_tick_count >= self.ticks_per_candle
         if self.next_candle_boundary is None:
             return False
-        return datetime.now() >= self.next_candle_boundary
+        if now is None:
+            now = self.clock()
+        return now >= self.next_candle_boundary
     
     def get_current_timestamp(self):
         """Get the timestamp of the current tick within the candle."""
-        if self.current_candle and 'datetime' in self.current_candle:
-            base_time = self.current_candle['datetime']
-            offset = timedelta(seconds=self.current_tick_count * self.tick_interval_seconds)
-            return base_time + offset
+        if self.has_more_data():
+            return datetime.fromtimestamp(self.get_current_timestamp_ms() / 1000.0)
         return datetime.now()
     
+    def get_current_timestamp_ms(self):
+        """Get the epoch-ms timestamp of the current tick within the candle."""
+        if self.has_more_data():
+            return self.current_candle_ms + int(self.current_tick_count * self.tick_interval_seconds * 1000)
+        return int(datetime.now().timestamp() * 1000)
+    
     def generate_tick(self):
         """Generate a single tick from the sequence."""
         if not self.tick_sequence:
@@ -158,18 +290,19 @@ class TickGenerator:
     def advance_candle(self):
         """Move to the next candle."""
         self.current_candle_index += 1
+        self.window.release(self.current_candle_index)
         
-        if self.current_candle_index < len(self.candles):
-            self.current_candle = self.candles[self.current_candle_index]
-            if self.current_candle_index + 1 < len(self.candles):
-                self.candle_duration_seconds = (self.candles[self.current_candle_index + 1]['datetime'] - 
-                                          self.current_candle['datetime']).total_seconds()
+        if self.window.has(self.current_candle_index):
+            current_ms = self.window.timestamp(self.current_candle_index)
+            next_ms = self.window.timestamp(self.current_candle_index + 1)
+            if next_ms is not None:
+                self.candle_duration_seconds = (next_ms - current_ms) / 1000.0
                 self.tick_interval_seconds = self.candle_duration_seconds / self.ticks_per_candle
             self._generate_tick_sequence()
-            self.next_candle_boundary = datetime.now() + timedelta(seconds=self.candle_duration_seconds)
+            if self.next_candle_boundary is not None:
+                self.next_candle_boundary += self.candle_duration_seconds
             self.current_tick_count = 0
             return True
         else:
-            self.current_candle = None
             self.tick_sequence = []
             return False
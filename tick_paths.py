@@ -0,0 +1,157 @@
+import numpy as np
+
+
+NOISE_FACTOR = 0.3
+TICK_SIZE_RATIO = 0.05
+
+
+def segment_lengths(ticks_per_candle):
+    """
+    Split the ticks after the open into the three keypoint segments.
+    
+    Matches TickGenerator: the first two segments get an equal share and the
+    last one takes whatever is left, so every path has ticks_per_candle ticks.
+    """
+    ticks_remaining = ticks_per_candle - 1
+    segment_ticks = max(1, ticks_remaining // 3)
+    
+    lengths = []
+    for i in range(3):
+        if i == 2:
+            length = ticks_remaining
+        else:
+            length = min(segment_ticks, ticks_remaining)
+        lengths.append(length)
+        ticks_remaining -= length
+    return lengths
+
+
+def generate_tick_paths(open_prices, high_prices, low_prices, close_prices, ticks_per_candle, rng=None):
+    """
+    Generate tick paths for a block of candles in one vectorized pass.
+    
+    Each path follows the same rules as TickGenerator._generate_tick_sequence:
+    open -> low -> high -> close for bullish candles and open -> high -> low -> close
+    otherwise, moving towards each keypoint with bounded uniform noise, clamped
+    to the candle's range and landing exactly on the keypoint at the end of
+    each segment. Flat candles repeat the open.
+    
+    Args:
+        open_prices, high_prices, low_prices, close_prices: Arrays of N candle values
+        ticks_per_candle: Number of ticks in each path
+        rng: numpy Generator used for the noise, for reproducible paths
+    
+    Returns:
+        float64 array of shape (N, ticks_per_candle), rounded to 2 decimals
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    
+    open_prices = np.asarray(open_prices, dtype=np.float64)
+    high_prices = np.asarray(high_prices, dtype=np.float64)
+    low_prices = np.asarray(low_prices, dtype=np.float64)
+    close_prices = np.asarray(close_prices, dtype=np.float64)
+    
+    count = len(open_prices)
+    paths = np.empty((count, ticks_per_candle), dtype=np.float64)
+    if count == 0:
+        return paths
+    
+    bullish = close_prices > open_prices
+    targets = (
+        np.where(bullish, low_prices, high_prices),
+        np.where(bullish, high_prices, low_prices),
+        close_prices,
+    )
+    
+    price_range = high_prices - low_prices
+    noise = rng.uniform(-NOISE_FACTOR, NOISE_FACTOR, size=(count, ticks_per_candle))
+    noise *= (price_range * TICK_SIZE_RATIO)[:, None]
+    
+    paths[:, 0] = open_prices
+    column = 1
+    for target, length in zip(targets, segment_lengths(ticks_per_candle)):
+        for j in range(length):
+            if j == length - 1:
+                paths[:, column] = target
+            else:
+                previous = paths[:, column - 1]
+                progress = (j + 1) / length
+                current = previous + (target - previous) * progress
+                current += noise[:, column]
+                np.clip(current, low_prices, high_prices, out=current)
+                paths[:, column] = current
+            column += 1
+    
+    flat = price_range == 0
+    if flat.any():
+        paths[flat] = open_prices[flat, None]
+    
+    return np.round(paths, 2)
+
+
+def keypoint_indices(ticks_per_candle):
+    """Return the tick indices where a path lands on its three keypoints; the last one is the close."""
+    return np.cumsum(segment_lengths(ticks_per_candle))
+
+
+def derive_tick_paths(base_paths, base_low, base_high, open_prices, high_prices, low_prices, close_prices,
+                      inverse=False):
+    """
+    Derive tick paths for related candles from the tick paths of another symbol.
+    
+    Each base path is normalized to its candle's range (0 at the low, 1 at the
+    high), mirrored for a symbol that moves against the base, e.g. a put, and
+    mapped onto the candle's own range. A piecewise linear correction between
+    the open, the two keypoint ticks and the close then makes every path start
+    at its open, touch its high and low on the ticks where the base path
+    touches its keypoints and end at its close, while following each move of
+    the base path in between. No noise is drawn.
+    
+    Args:
+        base_paths: Array of shape (N, ticks_per_candle) from generate_tick_paths
+        base_low, base_high: Arrays of the N base candles' lows and highs; no base candle may be flat
+        open_prices, high_prices, low_prices, close_prices: Arrays of the N related candle values
+        inverse: Move against the base path instead of with it
+    
+    Returns:
+        float64 array of shape (N, ticks_per_candle), rounded to 2 decimals
+    """
+    base_paths = np.asarray(base_paths, dtype=np.float64)
+    base_low = np.asarray(base_low, dtype=np.float64)
+    base_high = np.asarray(base_high, dtype=np.float64)
+    open_prices = np.asarray(open_prices, dtype=np.float64)
+    high_prices = np.asarray(high_prices, dtype=np.float64)
+    low_prices = np.asarray(low_prices, dtype=np.float64)
+    close_prices = np.asarray(close_prices, dtype=np.float64)
+    
+    count, ticks_per_candle = base_paths.shape
+    if count == 0:
+        return np.empty((0, ticks_per_candle), dtype=np.float64)
+    
+    shape = (base_paths - base_low[:, None]) / (base_high - base_low)[:, None]
+    if inverse:
+        shape = 1.0 - shape
+    
+    price_range = high_prices - low_prices
+    flat = price_range == 0
+    safe_range = np.where(flat, 1.0, price_range)
+    
+    anchors = np.concatenate(([0], keypoint_indices(ticks_per_candle)))
+    targets = np.empty((count, len(anchors)), dtype=np.float64)
+    targets[:, 0] = (open_prices - low_prices) / safe_range
+    targets[:, 1] = np.round(shape[:, anchors[1]])
+    targets[:, 2] = 1.0 - targets[:, 1]
+    targets[:, 3] = (close_prices - low_prices) / safe_range
+    
+    # One row of linear interpolation weights per anchor, so the correction is a single product.
+    ticks = np.arange(ticks_per_candle)
+    weights = np.array([np.interp(ticks, anchors, row) for row in np.eye(len(anchors))])
+    shape += (targets - shape[:, anchors]) @ weights
+    np.clip(shape, 0.0, 1.0, out=shape)
+    
+    paths = low_prices[:, None] + shape * price_range[:, None]
+    if flat.any():
+        paths[flat] = open_prices[flat, None]
+    
+    return np.round(paths, 2)
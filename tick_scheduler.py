@@ -0,0 +1,144 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+
+
+LATENESS_SAMPLES = 10000
+
+
+class ScheduledJob:
+    def __init__(self, period, deadline, callback):
+        """
+        A periodic callback registered with the scheduler.
+        
+        Args:
+            period: Seconds between runs
+            deadline: Next absolute run time on the scheduler clock
+            callback: Called as callback(now); returning False stops the job
+        """
+        self.period = period
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self.missed = 0
+    
+    def cancel(self):
+        """Stop the job. It is dropped the next time it comes due."""
+        self.cancelled = True
+
+
+class TickScheduler:
+    def __init__(self, clock=time.monotonic):
+        """
+        Central timer for every tick stream, driven by absolute deadlines.
+        
+        Jobs are kept in a heap ordered by deadline. Each job's next deadline is
+        its previous deadline plus its period, so the time spent sending does
+        not accumulate as drift. First deadlines are aligned to a multiple of
+        the period, so all jobs with the same period come due together and are
+        run in one wake-up.
+        
+        Args:
+            clock: Monotonic clock in seconds, also passed to every callback
+        """
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._lateness = deque(maxlen=LATENESS_SAMPLES)
+        self.steps = 0
+        self.jobs_run = 0
+        self.missed_deadlines = 0
+        self.max_lateness = 0.0
+    
+    def schedule(self, period, callback):
+        """Register callback to run every period seconds, starting at the next aligned deadline."""
+        now = self.clock()
+        deadline = math.ceil(now / period) * period
+        job = ScheduledJob(period, deadline, callback)
+        self._push(job)
+        self._wakeup.set()
+        return job
+    
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.deadline, next(self._counter), job))
+    
+    async def run(self):
+        """Run due jobs until cancelled."""
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            delay = self._heap[0][0] - self.clock()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            self._run_due(self.clock())
+    
+    def _run_due(self, now):
+        """Pop every job whose deadline has passed and run them as one step."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        
+        self.steps += 1
+        for job in due:
+            if job.cancelled:
+                continue
+            
+            lateness = now - job.deadline
+            self._lateness.append(lateness)
+            self.max_lateness = max(self.max_lateness, lateness)
+            self.jobs_run += 1
+            
+            try:
+                keep = job.callback(now)
+            except Exception as e:
+                print(f"Error in scheduled job: {e}")
+                keep = False
+            
+            if keep is False or job.cancelled:
+                job.cancelled = True
+                continue
+            
+            job.deadline += job.period
+            if job.deadline <= now:
+                skipped = math.floor((now - job.deadline) / job.period) + 1
+                job.deadline += skipped * job.period
+                job.missed += skipped
+                self.missed_deadlines += skipped
+            self._push(job)
+    
+    def stats(self):
+        """Return lateness and jitter statistics in milliseconds over recent runs."""
+        samples = sorted(self._lateness)
+        count = len(samples)
+        if count:
+            mean = sum(samples) / count
+            jitter = math.sqrt(sum((s - mean) ** 2 for s in samples) / count)
+            p50 = samples[count // 2]
+            p99 = samples[min(count - 1, int(count * 0.99))]
+        else:
+            mean = jitter = p50 = p99 = 0.0
+        
+        return {
+            "jobs": sum(1 for _, _, job in self._heap if not job.cancelled),
+            "steps": self.steps,
+            "jobs_run": self.jobs_run,
+            "missed_deadlines": self.missed_deadlines,
+            "lateness_mean_ms": mean * 1000,
+            "lateness_p50_ms": p50 * 1000,
+            "lateness_p99_ms": p99 * 1000,
+            "lateness_max_ms": self.max_lateness * 1000,
+            "jitter_ms": jitter * 1000
+        }
@@ -0,0 +1,355 @@
+import argparse
+import bisect
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+from replay import replay, parse_time_arg
+
+
+TAPE_EXTENSION = ".tape"
+TAPE_DIR = "tapes"
+MAGIC = b"STKT"
+VERSION = 1
+
+# magic, version, reserved, metadata length. The JSON metadata follows,
+# padded so every chunk starts 8-byte aligned.
+HEADER_FORMAT = "<4sHHI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# tick count, payload size, flags, reserved, first and last timestamp
+CHUNK_FORMAT = "<IIIIqq"
+CHUNK_HEADER_SIZE = struct.calcsize(CHUNK_FORMAT)
+CHUNK_COMPRESSED = 1
+
+DEFAULT_CHUNK_TICKS = 65536
+
+TIMESTAMP_DTYPE = np.dtype("<i8")
+PRICE_DTYPE = np.dtype("<f8")
+
+
+class TapeFileError(Exception):
+    """Raised when a tick tape file is malformed."""
+
+
+def tape_path(data_dir, symbol, label=None):
+    """Return the path of a symbol's tape in the data directory: tapes/SYMBOL.tape or tapes/SYMBOL_LABEL.tape."""
+    name = f"{symbol}_{label}" if label else symbol
+    return os.path.join(data_dir, TAPE_DIR, name + TAPE_EXTENSION)
+
+
+def _padding(size):
+    return -size % 8
+
+
+class TapeWriter:
+    def __init__(self, file_path, metadata=None, compress=False, chunk_ticks=DEFAULT_CHUNK_TICKS):
+        """
+        Append-only writer of a tick tape file.
+        
+        A tape is a header with JSON metadata followed by chunks of ticks, each
+        holding a timestamp column (int64 epoch ms) and a price column (float64),
+        optionally zlib-compressed. Chunks are only ever appended: opening an
+        existing tape continues after its last complete chunk and keeps its
+        metadata, and a chunk cut short by a crash is ignored by readers.
+        
+        Args:
+            file_path: Tape file to create or append to
+            metadata: JSON-serializable description stored in the header of a new tape
+            compress: Compress each chunk with zlib
+            chunk_ticks: Ticks buffered per chunk
+        """
+        self.file_path = file_path
+        self.compress = compress
+        self.chunk_ticks = max(1, chunk_ticks)
+        self.ticks_written = 0
+        self._timestamps = []
+        self._prices = []
+        
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            tape = TickTape(file_path)
+            end = tape.end_offset
+            self.metadata = tape.metadata
+            tape.close()
+            self._file = open(file_path, "r+b")
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.metadata = metadata or {}
+            encoded = json.dumps(self.metadata).encode()
+            self._file = open(file_path, "wb")
+            self._file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, 0, len(encoded)))
+            self._file.write(encoded + b"\0" * _padding(HEADER_SIZE + len(encoded)))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def append(self, timestamp_ms, price):
+        """Add a single tick."""
+        self._timestamps.append(timestamp_ms)
+        self._prices.append(price)
+        if len(self._timestamps) >= self.chunk_ticks:
+            self.flush()
+    
+    def extend(self, ticks):
+        """Add (timestamp_ms, price) ticks, e.g. the ticks of a replay."""
+        for timestamp_ms, price in ticks:
+            self._timestamps.append(timestamp_ms)
+            self._prices.append(price)
+            if len(self._timestamps) >= self.chunk_ticks:
+                self.flush()
+    
+    def flush(self):
+        """Write the buffered ticks as one chunk."""
+        count = len(self._timestamps)
+        if not count:
+            return
+        
+        timestamps = np.array(self._timestamps, dtype=TIMESTAMP_DTYPE)
+        prices = np.array(self._prices, dtype=PRICE_DTYPE)
+        payload = timestamps.tobytes() + prices.tobytes()
+        flags = 0
+        if self.compress:
+            payload = zlib.compress(payload)
+            flags |= CHUNK_COMPRESSED
+        
+        header = struct.pack(CHUNK_FORMAT, count, len(payload), flags, 0, int(timestamps[0]), int(timestamps[-1]))
+        self._file.write(header + payload + b"\0" * _padding(len(payload)))
+        self.ticks_written += count
+        self._timestamps = []
+        self._prices = []
+    
+    def close(self):
+        """Write the last chunk and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+class TickTape:
+    def __init__(self, file_path):
+        """
+        Memory-mapped reader of a tick tape file.
+        
+        Only the chunk headers are read when the tape is opened, into an index
+        of the time range of every chunk. Uncompressed chunks are read as
+        zero-copy NumPy views of the mapping; compressed chunks are
+        decompressed one at a time as playback reaches them.
+        """
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise TapeFileError("Empty tape file")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        buffer = self._buffer
+        if len(buffer) < HEADER_SIZE:
+            raise TapeFileError("File too small for tape header")
+        magic, version, _, metadata_size = struct.unpack_from(HEADER_FORMAT, buffer, 0)
+        if magic != MAGIC:
+            raise TapeFileError("Bad magic, not a tape file")
+        if version != VERSION:
+            raise TapeFileError(f"Unsupported tape file version {version}")
+        if len(buffer) < HEADER_SIZE + metadata_size:
+            raise TapeFileError("Truncated tape metadata")
+        self.metadata = json.loads(bytes(buffer[HEADER_SIZE:HEADER_SIZE + metadata_size]) or b"{}")
+        
+        # (offset, count, payload size, flags, first_ms, last_ms) per complete chunk
+        self.chunks = []
+        offset = HEADER_SIZE + metadata_size + _padding(HEADER_SIZE + metadata_size)
+        while offset + CHUNK_HEADER_SIZE <= len(buffer):
+            count, size, flags, _, first_ms, last_ms = struct.unpack_from(CHUNK_FORMAT, buffer, offset)
+            end = offset + CHUNK_HEADER_SIZE + size + _padding(size)
+            if end > len(buffer):
+                break
+            self.chunks.append((offset + CHUNK_HEADER_SIZE, count, size, flags, first_ms, last_ms))
+            offset = end
+        self.end_offset = offset
+        self._last_ms = [chunk[5] for chunk in self.chunks]
+    
+    def __len__(self):
+        return sum(chunk[1] for chunk in self.chunks)
+    
+    @property
+    def symbol(self):
+        return self.metadata.get("symbol")
+    
+    def chunk(self, index):
+        """Return the (timestamps, prices) columns of a chunk."""
+        offset, count, size, flags, _, _ = self.chunks[index]
+        if flags & CHUNK_COMPRESSED:
+            buffer = zlib.decompress(self._buffer[offset:offset + size])
+            offset = 0
+        else:
+            buffer = self._buffer
+        timestamps = np.frombuffer(buffer, dtype=TIMESTAMP_DTYPE, count=count, offset=offset)
+        prices = np.frombuffer(buffer, dtype=PRICE_DTYPE, count=count, offset=offset + count * 8)
+        return timestamps, prices
+    
+    def iter_chunks(self, start_ms=None, end_ms=None):
+        """
+        Yield the non-empty (timestamps, prices) columns of the ticks timestamped in [start_ms, end_ms].
+        
+        Chunks outside the range are skipped using the index, so seeking never
+        reads or decompresses them. Timestamps must not decrease along the tape,
+        as they do not in a recorded replay.
+        """
+        first = 0 if start_ms is None else bisect.bisect_left(self._last_ms, start_ms)
+        for index in range(first, len(self.chunks)):
+            if end_ms is not None and self.chunks[index][4] > end_ms:
+                return
+            timestamps, prices = self.chunk(index)
+            start = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side="left"))
+            stop = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side="right"))
+            if stop > start:
+                yield timestamps[start:stop], prices[start:stop]
+    
+    def iter_ticks(self, symbol=None, start_ms=None, end_ms=None):
+        """Yield (symbol, timestamp_ms, price) ticks, as replay does; symbol defaults to the recorded one."""
+        symbol = symbol if symbol is not None else self.symbol
+        for timestamps, prices in self.iter_chunks(start_ms, end_ms):
+            yield from zip(itertools.repeat(symbol), timestamps.tolist(), prices.tolist())
+    
+    def close(self):
+        self._buffer.close()
+
+
+class TapeGenerator:
+    def __init__(self, tape, start_ms=None, end_ms=None):
+        """
+        Replay source that plays a recorded tape instead of generating ticks.
+        
+        Used in place of a replay-mode TickGenerator: merge_ticks reads its
+        ticks through iter_ticks, so playback costs no per-tick generation and
+        yields exactly the recorded ticks every time.
+        
+        Args:
+            tape: TickTape to play
+            start_ms, end_ms: Only play ticks timestamped in this range
+        """
+        self.tape = tape
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+    
+    def has_more_data(self):
+        """Check whether the tape has any tick in range."""
+        return next(self.tape.iter_chunks(self.start_ms, self.end_ms), None) is not None
+    
+    def iter_ticks(self, symbol):
+        return self.tape.iter_ticks(symbol, self.start_ms, self.end_ms)
+
+
+def record_tape(file_path, symbol, ticks_per_candle=600, data_dir="data", batch_size=None, seed=None,
+                start_ms=None, end_ms=None, timeframe=None, compress=False, data_loader=None):
+    """
+    Replay a symbol and record its ticks to a tape file.
+    
+    Returns:
+        Number of ticks written
+    """
+    metadata = {
+        "symbol": symbol,
+        "ticks_per_candle": ticks_per_candle,
+        "batch_size": batch_size,
+        "seed": seed,
+        "from": start_ms,
+        "to": end_ms,
+        "timeframe": timeframe,
+        "recorded_at": datetime.now().isoformat(timespec="seconds")
+    }
+    ticks = replay([symbol], ticks_per_candle, data_dir, batch_size, seed, data_loader, start_ms, end_ms, timeframe)
+    
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    with TapeWriter(file_path, metadata, compress) as writer:
+        writer.extend((timestamp_ms, price) for _, timestamp_ms, price in ticks)
+    return writer.ticks_written
+
+
+def main():
+    """Record, inspect and play tick tapes."""
+    parser = argparse.ArgumentParser(description="Record replays to tick tape files and play them back.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    record = commands.add_parser("record", help="Record the replayed ticks of symbols to tapes")
+    record.add_argument("symbols", nargs="+", help="Symbols to record, one tape each")
+    record.add_argument("--data-dir", default="data", help="Data directory; tapes go to its tapes/ folder")
+    record.add_argument("--label", default=None, help="Record to tapes/SYMBOL_LABEL.tape")
+    record.add_argument("--ticks-per-candle", type=int, default=600, help="Ticks generated per candle")
+    record.add_argument("--batch-size", type=int, default=None, help="Candles per vectorized tick path batch")
+    record.add_argument("--seed", type=int, default=None, help="Seed for the price noise")
+    record.add_argument("--from", dest="start", type=parse_time_arg, default=None,
+                        help="Record candles from this time (epoch ms or date string)")
+    record.add_argument("--to", dest="end", type=parse_time_arg, default=None,
+                        help="Record candles up to this time (epoch ms or date string)")
+    record.add_argument("--timeframe", default=None, help="Resample candles to this timeframe, e.g. 5m")
+    record.add_argument("--compress", action="store_true", help="Compress tape chunks with zlib")
+    
+    info = commands.add_parser("info", help="Describe tape files")
+    info.add_argument("files", nargs="+", help="Tape files")
+    
+    play = commands.add_parser("play", help="Write the ticks of a tape to stdout as CSV")
+    play.add_argument("file", help="Tape file")
+    play.add_argument("--from", dest="start", type=parse_time_arg, default=None,
+                      help="Play ticks from this time (epoch ms or date string)")
+    play.add_argument("--to", dest="end", type=parse_time_arg, default=None,
+                      help="Play ticks up to this time (epoch ms or date string)")
+    play.add_argument("--quiet", action="store_true", help="Only print the tick count and throughput")
+    args = parser.parse_args()
+    
+    if args.command == "record":
+        for symbol in args.symbols:
+            file_path = tape_path(args.data_dir, symbol, args.label)
+            start = time.perf_counter()
+            count = record_tape(file_path, symbol, args.ticks_per_candle, args.data_dir, args.batch_size, args.seed,
+                                args.start, args.end, args.timeframe, args.compress)
+            elapsed = time.perf_counter() - start
+            print(f"Recorded {count} ticks of {symbol} to {file_path} "
+                  f"({os.path.getsize(file_path) / 1024:.0f} KiB, {elapsed:.2f}s)")
+    
+    elif args.command == "info":
+        for file_path in args.files:
+            tape = TickTape(file_path)
+            compressed = sum(1 for chunk in tape.chunks if chunk[3] & CHUNK_COMPRESSED)
+            time_range = (tape.chunks[0][4], tape.chunks[-1][5]) if tape.chunks else (None, None)
+            print(json.dumps({
+                "file": file_path,
+                "ticks": len(tape),
+                "chunks": len(tape.chunks),
+                "compressed_chunks": compressed,
+                "bytes": os.path.getsize(file_path),
+                "from": time_range[0],
+                "to": time_range[1],
+                "metadata": tape.metadata
+            }))
+            tape.close()
+    
+    else:
+        tape = TickTape(args.file)
+        start = time.perf_counter()
+        count = 0
+        out = sys.stdout
+        for symbol, timestamp_ms, tick_price in tape.iter_ticks(start_ms=args.start, end_ms=args.end):
+            count += 1
+            if not args.quiet:
+                out.write(f"{symbol},{timestamp_ms},{tick_price}\n")
+        
+        elapsed = time.perf_counter() - start
+        print(f"Played {count} ticks in {elapsed:.2f}s ({count / elapsed:.0f} ticks/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
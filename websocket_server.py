@@ -1,158 +1,1021 @@
 import asyncio
+import http
+import itertools
 import json
+import time
 import websockets
 from datetime import datetime
+from bar_builder import BarBuilder, bar_key
+from candle_store import parse_timestamp_ms, parse_timeframe
+from correlated_paths import CorrelatedPaths
 from data_loader import DataLoader
 from tick_generator import TickGenerator
 from response_formatter import ResponseFormatter
+from tick_broadcaster import TickBroadcaster
+from tick_scheduler import TickScheduler
+from replay import merge_ticks
+from serializers import dumps, loads, available_encodings, create_tick_encoder, BinaryTickEncoder
+from symbol_catalog import SymbolCatalog
+from tick_tape import TickTape, TapeGenerator, TapeFileError, tape_path
+from metrics import MetricsRegistry, TickMetrics
+from profiler import SamplingProfiler, DEFAULT_INTERVAL_MS
+from send_queue import SendQueue, SendQueueOverflow, POLICIES, DEFAULT_POLICY, DEFAULT_MAX_MESSAGES, DEFAULT_MAX_LAG_MS
+
+# Replay yields to other clients after this many frames.
+REPLAY_YIELD_EVERY = 100
+
+# How often the data directory is checked for added, removed or replaced files.
+CATALOG_POLL_SECONDS = 2
+
+# Gaps in candle time longer than this (overnight, between expiries) are
+# skipped when pacing a replay.
+REPLAY_MAX_GAP_MS = 60000
+
+
+def ticks_per_candle_for(tick_frequency_ms):
+    """Ticks generated per candle at a tick frequency: one per tick interval of a minute, at least 10."""
+    return max(10, int(60000 / tick_frequency_ms))
 
 
 class WebSocketServer:
-    def __init__(self, host="localhost", port=8765):
+    def __init__(self, host="localhost", port=8765, data_dir="data"):
         self.host = host
         self.port = port
-        self.data_loader = DataLoader()
+        self.data_loader = DataLoader(data_dir, catalog=SymbolCatalog(data_dir, auto_refresh=False))
+        self.scheduler = TickScheduler()
+        self.metrics_registry = MetricsRegistry()
+        self.metrics = TickMetrics(self.metrics_registry)
+        self.broadcaster = TickBroadcaster(self.scheduler, self.metrics)
+        self.profiler = SamplingProfiler()
         self.clients = {}
+        self._register_metrics()
+    
+    def _register_metrics(self):
+        """Expose client, send queue, scheduler and cache state as collected metrics."""
+        registry = self.metrics_registry
+        registry.collect("ticksim_clients", "Subscribed clients", lambda: len(self.clients))
+        registry.collect("ticksim_broadcast_streams", "Running broadcast streams",
+                         lambda: len(self.broadcaster.running_streams))
+        registry.collect("ticksim_send_queue_depth", "Messages waiting in send queues",
+                         lambda: sum(len(q) for q in self._send_queues()))
+        registry.collect("ticksim_send_queue_dropped", "Messages dropped by the send queues of current clients",
+                         lambda: sum(q.dropped for q in self._send_queues()))
+        registry.collect("ticksim_send_queue_lag_max_seconds", "Largest wait of a sent message, current clients",
+                         lambda: max((q.max_lag_seen_ms for q in self._send_queues()), default=0.0) / 1000.0)
+        registry.collect("ticksim_scheduler_jobs_run_total", "Scheduled tick jobs run",
+                         lambda: self.scheduler.jobs_run, metric_type="counter")
+        registry.collect("ticksim_scheduler_missed_deadlines_total", "Tick deadlines skipped because a job ran late",
+                         lambda: self.scheduler.missed_deadlines, metric_type="counter")
+        registry.collect("ticksim_scheduler_lateness_seconds", "Lateness of scheduled tick jobs over recent runs",
+                         self._scheduler_lateness, ("quantile",))
+        for name in ("hits", "misses", "evictions"):
+            registry.collect(f"ticksim_cache_{name}_total", f"Candle cache {name}",
+                             lambda name=name: self.data_loader.cache.stats()[name], metric_type="counter")
+        registry.collect("ticksim_cache_bytes", "Estimated size of cached candles",
+                         lambda: self.data_loader.cache.stats()["bytes"])
+        registry.collect("ticksim_cache_entries", "Cached candle sets",
+                         lambda: self.data_loader.cache.stats()["entries"])
+    
+    def _send_queues(self):
+        return [client["send_queue"] for client in list(self.clients.values()) if client.get("send_queue") is not None]
+    
+    def _scheduler_lateness(self):
+        stats = self.scheduler.stats()
+        return {
+            ("0.5",): stats["lateness_p50_ms"] / 1000.0,
+            ("0.99",): stats["lateness_p99_ms"] / 1000.0,
+            ("1",): stats["lateness_max_ms"] / 1000.0
+        }
         
     async def handle_client(self, websocket, path):
-        """Handle a client connection."""
+        """
+        Handle a client connection.
+        
+        Ticks are streamed by a background task, so requests keep being read
+        while the stream runs and the subscription can be changed mid-stream.
+        """
         client_id = id(websocket)
         print(f"Client {client_id} connected")
         
         try:
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    data = loads(message)
                     action = data.get("action", "").upper()
                     
                     if action == "SUBSCRIBE":
                         await self.handle_subscribe(websocket, client_id, data)
+                    elif action == "UNSUBSCRIBE":
+                        await self.handle_unsubscribe(websocket, client_id, data)
+                    elif action == "LIST_SYMBOLS":
+                        await self.handle_list_symbols(websocket, data)
+                    elif action == "STATS":
+                        await self.handle_stats(websocket)
+                    elif action == "PROFILE":
+                        await self.handle_profile(websocket, data)
                     else:
-                        await websocket.send(json.dumps({
-                            "error": "Unknown action. Use 'SUBSCRIBE'."
+                        await websocket.send(dumps({
+                            "error": "Unknown action. Use 'SUBSCRIBE', 'UNSUBSCRIBE', 'LIST_SYMBOLS', 'STATS' or "
+                                     "'PROFILE'."
                         }))
                 except json.JSONDecodeError:
-                    await websocket.send(json.dumps({
+                    await websocket.send(dumps({
                         "error": "Invalid JSON format"
                     }))
                 except Exception as e:
-                    await websocket.send(json.dumps({
+                    await websocket.send(dumps({
                         "error": f"Error processing request: {str(e)}"
                     }))
         except websockets.exceptions.ConnectionClosed:
             print(f"Client {client_id} disconnected")
         finally:
-            if client_id in self.clients:
-                self.clients[client_id]["active"] = False
-                del self.clients[client_id]
+            await self.end_session(client_id)
+    
+    async def end_session(self, client_id):
+        """Stop a client's tick stream and forget the client."""
+        client = self.clients.pop(client_id, None)
+        if client is None:
+            return
+        
+        client["active"] = False
+        task = client.get("task")
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    async def handle_list_symbols(self, websocket, data):
+        """Send the catalog entries of the requested symbols, or of every symbol."""
+        catalog = self.data_loader.catalog
+        symbols = data.get("symbols") or catalog.symbols()
+        
+        # Row counts and time ranges of JSON files not seen before need a parse,
+        # so describe off the event loop.
+        descriptions = await asyncio.to_thread(lambda: [catalog.describe(symbol) for symbol in symbols])
+        
+        await websocket.send(dumps({
+            "type": "catalog",
+            "symbols": [description for description in descriptions if description is not None]
+        }))
+    
+    async def handle_stats(self, websocket):
+        """Send the server stats and every metric."""
+        await websocket.send(dumps({
+            "type": "stats",
+            "stats": self.stats(),
+            "metrics": self.metrics_registry.snapshot()
+        }))
+    
+    async def handle_profile(self, websocket, data):
+        """
+        Switch the sampling profiler on or off and report what it collected.
+        
+        Commands: "start" (optional intervalMs), "stop", and "report" (the
+        default), which sends the top functions without stopping. With
+        "collapsed": true the report holds collapsed stacks for flame graphs.
+        """
+        command = data.get("command", "report").lower()
+        if command == "start":
+            self.profiler.start(data.get("intervalMs", DEFAULT_INTERVAL_MS))
+            print(f"Sampling profiler started every {self.profiler.interval_ms} ms")
+        elif command == "stop":
+            if self.profiler.stop():
+                print(f"Sampling profiler stopped after {self.profiler.samples} samples")
+        elif command != "report":
+            await websocket.send(dumps({
+                "error": f"Unknown profile command: {command}. Use 'start', 'stop' or 'report'."
+            }))
+            return
+        
+        response = {"type": "profile", "profile": self.profiler.report(data.get("limit", 20))}
+        if data.get("collapsed", False):
+            response["collapsed"] = self.profiler.collapsed()
+        await websocket.send(dumps(response))
+    
+    async def process_http_request(self, path, request_headers):
+        """Answer plain HTTP GET /metrics with the Prometheus text exposition; other paths upgrade to websocket."""
+        if path.split("?", 1)[0] != "/metrics":
+            return None
+        return (http.HTTPStatus.OK, [("Content-Type", "text/plain; version=0.0.4; charset=utf-8")],
+                self.metrics_registry.render().encode())
     
     async def handle_subscribe(self, websocket, client_id, data):
-        """Handle subscription request from client."""
+        """
+        Handle subscription request from client.
+        
+        The first SUBSCRIBE of a connection starts its tick stream in a
+        background task. While that stream runs, a SUBSCRIBE adds symbols to it
+        and may change tickFrequencyMs, see update_subscription.
+        """
         symbols = data.get("symbols", [])
         tick_frequency_ms = data.get("tickFrequencyMs", 100)
         override_time = data.get("overrideTime", False)
+        tape = data.get("tape", None)
+        replay = data.get("replay", False) or bool(tape)
+        batch_candles = data.get("batchCandles", None)
+        seed = data.get("seed", None)
+        encoding = data.get("encoding", "json")
+        backpressure = data.get("backpressure", DEFAULT_POLICY)
+        timeframe = data.get("timeframe", None)
+        bars = data.get("bars", False)
+        send_tick_frames = data.get("ticks", True)
+        correlated = data.get("correlated", False)
         response_format = data.get("responseFormat", {})
         template = response_format.get("template", None)
         
         if not symbols:
-            await websocket.send(json.dumps({
+            await websocket.send(dumps({
                 "error": "No symbols provided"
             }))
             return
         
+        if encoding not in available_encodings():
+            await websocket.send(dumps({
+                "error": f"Unsupported encoding: {encoding}. Use one of {', '.join(available_encodings())}."
+            }))
+            return
+        
+        if not bars and not send_tick_frames:
+            await websocket.send(dumps({
+                "error": "Nothing to stream: set bars to true or leave ticks enabled"
+            }))
+            return
+        
+        if tape and bars:
+            await websocket.send(dumps({
+                "error": "Bars are not available for tape playback"
+            }))
+            return
+        
+        if correlated and tape:
+            await websocket.send(dumps({
+                "error": "Correlated generation is not available for tape playback"
+            }))
+            return
+        
+        if correlated and data.get("broadcast", False) and not replay:
+            await websocket.send(dumps({
+                "error": "Correlated generation is not available in broadcast mode"
+            }))
+            return
+        
+        if backpressure not in POLICIES:
+            await websocket.send(dumps({
+                "error": f"Unsupported backpressure policy: {backpressure}. Use one of {', '.join(POLICIES)}."
+            }))
+            return
+        
+        try:
+            start_ms = parse_timestamp_ms(data["from"]) if data.get("from") is not None else None
+            end_ms = parse_timestamp_ms(data["to"]) if data.get("to") is not None else None
+        except (ValueError, OverflowError) as e:
+            await websocket.send(dumps({
+                "error": f"Invalid time range: {e}"
+            }))
+            return
+        
+        if start_ms is not None and end_ms is not None and start_ms > end_ms:
+            await websocket.send(dumps({
+                "error": "Invalid time range: 'from' is after 'to'"
+            }))
+            return
+        
+        client = self.clients.get(client_id)
+        if client is not None and not client["task"].done():
+            await self.update_subscription(websocket, client, data, symbols, start_ms, end_ms)
+            return
+        
+        if timeframe is not None:
+            try:
+                parse_timeframe(timeframe)
+            except ValueError as e:
+                await websocket.send(dumps({
+                    "error": f"{e}. Use a count and a unit of m, h or d, e.g. 5m."
+                }))
+                return
+            symbols = await self.playable_symbols(websocket, symbols, timeframe)
+        
+        bar_builder = BarBuilder(data.get("partialBarsMs")) if bars else None
+        
+        paths = None
+        if correlated:
+            underlying = correlated if isinstance(correlated, str) else data["symbols"][0]
+            paths = await asyncio.to_thread(self.create_correlated_paths, underlying, seed, start_ms, end_ms,
+                                            timeframe)
+            if paths is None:
+                await websocket.send(dumps({
+                    "error": f"No data found for underlying symbol: {underlying}"
+                }))
+                return
+        
+        # Replays wait on the socket instead, sending only as fast as the client reads.
+        send_queue = None
+        if not replay:
+            send_queue = self.create_send_queue(websocket, client_id, backpressure, data.get("maxQueueSize"),
+                                                data.get("maxLagMs"))
+        
+        if data.get("broadcast", False) and not replay:
+            await self.handle_broadcast_subscribe(websocket, client_id, symbols, tick_frequency_ms,
+                                                  override_time, template, encoding, send_queue,
+                                                  start_ms, end_ms, timeframe, bar_builder, send_tick_frames)
+            return
+        
         symbol_generators = {}
         for symbol in symbols:
-            candles = self.data_loader.load_symbol_data(symbol)
-            if not candles:
-                await websocket.send(json.dumps({
-                    "error": f"No data found for symbol: {symbol}"
+            # Loading the first candles can read and parse whole files, so it runs off the event loop.
+            if tape:
+                generator = await asyncio.to_thread(self.open_tape, symbol, tape, start_ms, end_ms)
+            else:
+                generator = await asyncio.to_thread(self.create_generator, symbol, tick_frequency_ms, batch_candles,
+                                                    seed, replay, start_ms, end_ms, timeframe, paths)
+            if generator is None:
+                await websocket.send(dumps({
+                    "error": f"No {'tape' if tape else 'data'} found for symbol: {symbol}"
                 }))
                 continue
             
-            ticks_per_candle = max(10, int(60000 / tick_frequency_ms))
-            generator = TickGenerator(candles, ticks_per_candle)
             symbol_generators[symbol] = generator
         
         if not symbol_generators:
-            await websocket.send(json.dumps({
+            await websocket.send(dumps({
                 "error": "No valid symbols found"
             }))
             return
         
-        self.clients[client_id] = {
+        encoder = create_tick_encoder(encoding, ResponseFormatter(template), json.dumps(template, sort_keys=True),
+                                      list(symbol_generators), self.metrics)
+        await self.announce_symbol_ids(websocket, encoder)
+        
+        client = {
             "websocket": websocket,
             "symbol_generators": symbol_generators,
             "tick_frequency_ms": tick_frequency_ms,
             "override_time": override_time,
-            "formatter": ResponseFormatter(template),
+            "batch": data.get("batch", False),
+            "batch_candles": batch_candles,
+            "seed": seed,
+            "timeframe": timeframe,
+            "paths": paths,
+            "bars": bar_builder,
+            "ticks": send_tick_frames,
+            "replay": replay,
+            "encoder": encoder,
+            "send_queue": send_queue,
+            "job": None,
             "active": True
         }
+        self.clients[client_id] = client
         
-        await self.send_ticks(client_id)
+        if replay:
+            client["task"] = asyncio.ensure_future(self.send_replay(client_id, data.get("speed", 0)))
+        else:
+            client["task"] = asyncio.ensure_future(self.send_ticks(client_id))
     
-    async def send_ticks(self, client_id):
-        """Send ticks to a specific client based on their subscription."""
+    async def update_subscription(self, websocket, client, data, symbols, start_ms, end_ms):
+        """
+        Change a running stream: add symbols and apply a new tickFrequencyMs.
+        
+        Symbols already subscribed keep their generator (or broadcast stream)
+        and position, and new symbols load through the shared candle cache, so
+        nothing already loaded is reloaded. The encoding, template, batching,
+        backpressure, timeframe, bar and correlation settings of the first SUBSCRIBE stay in effect.
+        """
+        if client["replay"]:
+            await websocket.send(dumps({
+                "error": "A running replay cannot be changed. Unsubscribe to stop it."
+            }))
+            return
+        
+        tick_frequency_ms = data.get("tickFrequencyMs", client["tick_frequency_ms"])
+        if tick_frequency_ms != client["tick_frequency_ms"]:
+            await self.set_tick_frequency(client, tick_frequency_ms)
+        
+        subscriptions = client["streams"] if "streams" in client else client["symbol_generators"]
+        added = [symbol for symbol in dict.fromkeys(symbols) if symbol not in subscriptions]
+        if client["timeframe"] is not None:
+            added = await self.playable_symbols(websocket, added, client["timeframe"])
+        
+        if "streams" in client:
+            if client["encoder"].add_symbols(added):
+                await self.announce_symbol_ids(websocket, client["encoder"])
+            for symbol in added:
+                stream = await self.subscribe_broadcast(client, symbol, start_ms, end_ms)
+                if stream is None:
+                    await websocket.send(dumps({
+                        "error": f"No data found for symbol: {symbol}"
+                    }))
+            client["changed"].set()
+        else:
+            generators = {}
+            for symbol in added:
+                generator = await asyncio.to_thread(self.create_generator, symbol, tick_frequency_ms,
+                                                    client["batch_candles"], client["seed"], start_ms=start_ms,
+                                                    end_ms=end_ms, timeframe=client["timeframe"],
+                                                    paths=client["paths"])
+                if generator is None:
+                    await websocket.send(dumps({
+                        "error": f"No data found for symbol: {symbol}"
+                    }))
+                    continue
+                generators[symbol] = generator
+            
+            # Announce binary ids before the new symbols produce their first tick.
+            if client["encoder"].add_symbols(list(generators)):
+                await self.announce_symbol_ids(websocket, client["encoder"])
+            client["symbol_generators"].update(generators)
+        
+        await websocket.send(dumps({
+            "status": "subscribed",
+            "symbols": list(subscriptions),
+            "tickFrequencyMs": client["tick_frequency_ms"]
+        }))
+    
+    async def set_tick_frequency(self, client, tick_frequency_ms):
+        """
+        Switch a running stream to a new tick frequency.
+        
+        Private generators keep their position and take the new ticks per
+        candle from their next candle. Broadcast clients keep their position
+        too: a stream the client has to itself is switched as a whole, and
+        from a shared stream the client branches off to a new stream that
+        continues at the same candle, see move_broadcast.
+        """
+        client["tick_frequency_ms"] = tick_frequency_ms
+        
+        if "streams" in client:
+            for symbol, stream in list(client["streams"].items()):
+                client["streams"][symbol] = await self.move_broadcast(client, stream, tick_frequency_ms)
+            client["changed"].set()
+            return
+        
+        ticks_per_candle = ticks_per_candle_for(tick_frequency_ms)
+        for generator in client["symbol_generators"].values():
+            generator.set_ticks_per_candle(ticks_per_candle)
+        
+        if client["job"] is not None:
+            client["job"].cancel()
+            client["job"] = self.scheduler.schedule(tick_frequency_ms / 1000.0,
+                                                    lambda now: self._client_step(client, now))
+    
+    async def handle_unsubscribe(self, websocket, client_id, data):
+        """
+        Remove symbols from a running stream, or every symbol when none are given.
+        
+        Removed generators are dropped at once and broadcast streams are left,
+        so their candles are freed. Once no symbol is left the stream ends with
+        the usual completed message; a replay stops right away.
+        """
+        client = self.clients.get(client_id)
+        if client is None or client["task"].done():
+            await websocket.send(dumps({
+                "error": "No active subscription"
+            }))
+            return
+        
+        subscriptions = client["streams"] if "streams" in client else client["symbol_generators"]
+        symbols = data.get("symbols") or list(subscriptions)
+        
+        if client["replay"]:
+            if set(symbols) != set(subscriptions):
+                await websocket.send(dumps({
+                    "error": "A running replay cannot be changed. Unsubscribe every symbol to stop it."
+                }))
+                return
+            client["active"] = False
+            client["task"].cancel()
+        
+        for symbol in symbols:
+            removed = subscriptions.pop(symbol, None)
+            if removed is not None and "streams" in client:
+                removed.remove_subscriber(websocket)
+            if removed is not None and client["bars"] is not None:
+                client["bars"].discard(symbol)
+        if "changed" in client:
+            client["changed"].set()
+        
+        await websocket.send(dumps({
+            "status": "unsubscribed",
+            "symbols": list(subscriptions)
+        }))
+    
+    async def playable_symbols(self, websocket, symbols, timeframe):
+        """
+        Return the symbols whose data can be resampled to timeframe.
+        
+        A timeframe must be a multiple of the timeframe a symbol's data is
+        stored at; an error is sent for every symbol it is not.
+        """
+        interval_ms = parse_timeframe(timeframe)
+        playable = []
+        for symbol in symbols:
+            base_timeframe = self.data_loader.catalog.timeframe(symbol)
+            if base_timeframe is not None and interval_ms % parse_timeframe(base_timeframe):
+                await websocket.send(dumps({
+                    "error": f"Timeframe {timeframe} is not a multiple of the {base_timeframe} data of {symbol}"
+                }))
+                continue
+            playable.append(symbol)
+        return playable
+    
+    def create_generator(self, symbol, tick_frequency_ms, batch_candles=None, seed=None, replay=False,
+                         start_ms=None, end_ms=None, timeframe=None, paths=None):
+        """
+        Build a tick generator streaming a symbol's candles, or return None if it has no data.
+        
+        With start_ms and end_ms only the candles starting in that epoch-ms range
+        are played, and with a timeframe the candles are resampled to it. With
+        paths the tick paths are derived from that shared underlying path.
+        """
+        ticks_per_candle = ticks_per_candle_for(tick_frequency_ms)
+        candles = self.data_loader.stream_symbol_data(symbol, start_ms=start_ms, end_ms=end_ms, timeframe=timeframe)
+        generator = TickGenerator(candles, ticks_per_candle, batch_candles, seed, replay=replay, paths=paths)
+        if not generator.has_more_data():
+            return None
+        return generator
+    
+    def create_correlated_paths(self, symbol, seed=None, start_ms=None, end_ms=None, timeframe=None):
+        """Build the shared path of an underlying for correlated generation, or return None if it has no data."""
+        if self.data_loader.get_signature(symbol) is None:
+            return None
+        candles = self.data_loader.stream_symbol_data(symbol, start_ms=start_ms, end_ms=end_ms, timeframe=timeframe)
+        return CorrelatedPaths(candles, seed)
+    
+    def open_tape(self, symbol, label=True, start_ms=None, end_ms=None):
+        """
+        Open a symbol's recorded tick tape for replay, or return None if it has none or no ticks in range.
+        
+        Args:
+            label: True for tapes/SYMBOL.tape, or a label string for tapes/SYMBOL_LABEL.tape
+        """
+        file_path = tape_path(self.data_loader.data_dir, symbol, label if isinstance(label, str) else None)
+        try:
+            generator = TapeGenerator(TickTape(file_path), start_ms, end_ms)
+        except (OSError, TapeFileError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Error opening tape {file_path}: {e}")
+            return None
+        if not generator.has_more_data():
+            return None
+        return generator
+    
+    def create_send_queue(self, websocket, client_id, policy, max_messages=None, max_lag_ms=None):
+        """Build a client's bounded send queue; the disconnect policy closes the socket when it trips."""
+        def disconnect():
+            print(f"Client {client_id} lagging too far behind, disconnecting")
+            asyncio.ensure_future(websocket.close(1008, "Client too slow"))
+        
+        return SendQueue(
+            policy,
+            max_messages if max_messages is not None else DEFAULT_MAX_MESSAGES,
+            max_lag_ms if max_lag_ms is not None else DEFAULT_MAX_LAG_MS,
+            on_overflow=disconnect
+        )
+    
+    async def announce_symbol_ids(self, websocket, encoder):
+        """Tell binary-encoding clients which symbol each record id stands for."""
+        if isinstance(encoder, BinaryTickEncoder):
+            await websocket.send(dumps({
+                "type": "symbols",
+                "symbols": encoder.symbol_ids
+            }))
+    
+    async def handle_broadcast_subscribe(self, websocket, client_id, symbols, tick_frequency_ms,
+                                         override_time, template, encoding, send_queue, start_ms=None,
+                                         end_ms=None, timeframe=None, bar_builder=None, send_tick_frames=True):
+        """Attach a client to shared per-symbol tick streams instead of private generators."""
+        encoder = create_tick_encoder(encoding, ResponseFormatter(template), json.dumps(template, sort_keys=True),
+                                      symbols, self.metrics)
+        client = {
+            "websocket": websocket,
+            "streams": {},
+            "tick_frequency_ms": tick_frequency_ms,
+            "override_time": override_time,
+            "timeframe": timeframe,
+            "bars": bar_builder,
+            "ticks": send_tick_frames,
+            "replay": False,
+            "encoder": encoder,
+            "send_queue": send_queue,
+            "changed": asyncio.Event(),
+            "active": True
+        }
+        
+        for symbol in dict.fromkeys(symbols):
+            if await self.subscribe_broadcast(client, symbol, start_ms, end_ms) is None:
+                await websocket.send(dumps({
+                    "error": f"No data found for symbol: {symbol}"
+                }))
+        
+        if not client["streams"]:
+            await websocket.send(dumps({
+                "error": "No valid symbols found"
+            }))
+            return
+        
+        await self.announce_symbol_ids(websocket, encoder)
+        
+        self.clients[client_id] = client
+        client["task"] = asyncio.ensure_future(self.send_broadcast(client_id))
+    
+    async def subscribe_broadcast(self, client, symbol, start_ms=None, end_ms=None):
+        """
+        Attach a broadcast client to the shared stream of a symbol; returns None if the symbol has no data.
+        
+        A stream that is not running yet gets its generator built in a thread,
+        so loading the symbol does not hold up other clients.
+        """
+        tick_frequency_ms = client["tick_frequency_ms"]
+        timeframe = client["timeframe"]
+        generator = None
+        if self.broadcaster.running_stream(symbol, tick_frequency_ms, client["override_time"], (start_ms, end_ms),
+                                           timeframe) is None:
+            generator = await asyncio.to_thread(self.create_generator, symbol, tick_frequency_ms, start_ms=start_ms,
+                                                end_ms=end_ms, timeframe=timeframe)
+            if generator is None:
+                return None
+        # Another client may have started the stream meanwhile; it is joined and this generator dropped.
+        stream = self.broadcaster.subscribe(
+            client["websocket"], symbol, tick_frequency_ms, client["override_time"], client["encoder"],
+            client["send_queue"],
+            lambda: generator,
+            (start_ms, end_ms),
+            timeframe,
+            client["bars"],
+            client["ticks"]
+        )
+        if stream is not None:
+            client["streams"][symbol] = stream
+        return stream
+    
+    async def move_broadcast(self, client, stream, tick_frequency_ms):
+        """Move a broadcast client's stream of one symbol to a new tick frequency without losing its position."""
+        websocket = client["websocket"]
+        generator = stream.generator
+        if stream.finished.is_set() or websocket not in stream.subscribers:
+            return stream
+        if len(stream.subscribers) == 1:
+            return self.broadcaster.retune(stream, tick_frequency_ms, ticks_per_candle_for(tick_frequency_ms))
+        
+        # Other clients stay on the old stream, so this one gets a generator
+        # starting at the current candle and picking up its elapsed part. The
+        # old stream keeps playing while it loads; if it moved on to the next
+        # candle meanwhile, load again from there.
+        while True:
+            candle_ms = generator.current_candle_ms
+            branched = await asyncio.to_thread(self.create_generator, stream.symbol, tick_frequency_ms,
+                                               start_ms=candle_ms, end_ms=stream.time_range[1],
+                                               timeframe=stream.timeframe)
+            if branched is None or websocket not in stream.subscribers:
+                return stream
+            if generator.current_candle_ms == candle_ms:
+                break
+        branched.follow(generator)
+        return self.broadcaster.branch(websocket, stream, tick_frequency_ms, branched)
+    
+    async def send_broadcast(self, client_id):
+        """Write a broadcast client's queued ticks until its streams finish or it disconnects."""
         client = self.clients.get(client_id)
         if not client:
             return
         
         websocket = client["websocket"]
-        symbol_generators = client["symbol_generators"]
-        tick_frequency_ms = client["tick_frequency_ms"]
-        override_time = client["override_time"]
-        formatter = client["formatter"]
+        send_queue = client["send_queue"]
+        writer = asyncio.ensure_future(self._drain_send_queue(websocket, send_queue))
+        all_finished = asyncio.ensure_future(self._wait_for_streams(client))
+        closed = asyncio.ensure_future(websocket.wait_closed())
+        try:
+            await asyncio.wait([writer, all_finished, closed], return_when=asyncio.FIRST_COMPLETED)
+            if all_finished.done() and not writer.done():
+                send_queue.finish()
+            await asyncio.wait([writer, closed], return_when=asyncio.FIRST_COMPLETED)
+            if writer.done():
+                writer.result()
+                await websocket.send(dumps({
+                    "status": "completed",
+                    "message": "All symbol data has been processed"
+                }))
+        except websockets.exceptions.ConnectionClosed:
+            print(f"Client {client_id} connection closed during tick streaming")
+        except SendQueueOverflow:
+            pass
+        finally:
+            writer.cancel()
+            all_finished.cancel()
+            closed.cancel()
+            self.broadcaster.unsubscribe(websocket, list(client["streams"].values()))
+    
+    async def _wait_for_streams(self, client):
+        """Wait until every tick stream of a broadcast client has finished, following subscription changes."""
+        while True:
+            pending = [stream for stream in client["streams"].values() if not stream.finished.is_set()]
+            if not pending:
+                return
+            
+            changed = client["changed"]
+            changed.clear()
+            waiters = [asyncio.ensure_future(stream.finished.wait()) for stream in pending]
+            waiters.append(asyncio.ensure_future(changed.wait()))
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+    
+    async def _drain_send_queue(self, websocket, send_queue):
+        """Write a client's queued messages to its socket until the queue is finished."""
+        while True:
+            item = await send_queue.get_item()
+            if item is None:
+                return
+            await self._send_counted(websocket, *item)
+    
+    async def _send_counted(self, websocket, message, key):
+        """
+        Write one frame to a socket, timing a sample of the sends and counting it in the metrics.
+        
+        Args:
+            websocket: Socket to write to
+            message: Encoded frame
+            key: Symbol, tuple of symbols or BarKey the frame is counted under, as for send queues
+        """
+        metrics = self.metrics
+        if metrics.sample():
+            start = time.perf_counter()
+            await websocket.send(message)
+            metrics.send.observe(time.perf_counter() - start)
+        else:
+            await websocket.send(message)
+        metrics.count_sent(key)
+    
+    async def send_replay(self, client_id, speed=0):
+        """
+        Replay a client's ticks in candle time without the scheduler.
+        
+        With speed 0 ticks are sent as fast as the socket accepts them. Otherwise
+        they are paced so that candle time runs speed times faster than wall-clock
+        time. Ticks sharing a timestamp form one step, sent as one frame when the
+        client asked for batching.
+        """
+        client = self.clients.get(client_id)
+        if not client:
+            return
+        
+        websocket = client["websocket"]
+        encoder = client["encoder"]
+        bars = client["bars"]
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        elapsed_ms = 0
+        previous_ms = None
+        frames = 0
+        ticks_generated = self.metrics.ticks_generated
         
         try:
-            while client.get("active", False):
-                active_symbols = [s for s, g in symbol_generators.items() if g.has_more_data()]
+            symbol_generators = client["symbol_generators"]
+            await self.wait_for_candles(symbol_generators)
+            ticks = merge_ticks(symbol_generators, candles=bars is not None)
+            for timestamp_ms, step in itertools.groupby(ticks, key=lambda tick: tick[1]):
+                if not client.get("active", False):
+                    return
                 
-                if not active_symbols:
-                    await websocket.send(json.dumps({
-                        "status": "completed",
-                        "message": "All symbol data has been processed"
-                    }))
-                    break
+                if speed:
+                    if previous_ms is not None:
+                        elapsed_ms += min(timestamp_ms - previous_ms, REPLAY_MAX_GAP_MS)
+                    previous_ms = timestamp_ms
+                    delay = start_time + elapsed_ms / 1000.0 / speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
                 
-                for symbol in active_symbols:
-                    generator = symbol_generators[symbol]
-                    if generator.should_advance_candle():
-                        generator.advance_candle()
+                step = list(step)
+                # Counted like scheduled ticks, including those played from a tape.
+                for tick in step:
+                    ticks_generated.labels(tick[0]).inc()
                 
-                for symbol in active_symbols:
-                    generator = symbol_generators[symbol]
-                    
-                    if not generator.has_more_data():
-                        continue
-                    
-                    tick_price = generator.generate_tick()
-                    
-                    if tick_price is None:
-                        continue
-                    
-                    if override_time:
-                        timestamp_dt = generator.get_current_timestamp()
-                        timestamp_ms = int(timestamp_dt.timestamp() * 1000)
-                    else:
-                        timestamp_ms = int(datetime.now().timestamp() * 1000)
-                    
-                    response = formatter.format_response(symbol, timestamp_ms, tick_price)
-                    await websocket.send(json.dumps(response))
+                if bars is not None:
+                    bar_messages = [bar for tick in step for bar in bars.add_tick(*tick)]
+                    step = [tick[:3] for tick in step]
+                
+                if not client["ticks"]:
+                    pass
+                elif client["batch"]:
+                    await self._send_counted(websocket, encoder.encode_batch(step), tuple(tick[0] for tick in step))
+                    frames += 1
+                else:
+                    for tick in step:
+                        await self._send_counted(websocket, encoder.encode(*tick), tick[0])
+                        frames += 1
                 
-                await asyncio.sleep(tick_frequency_ms / 1000.0)
+                if bars is not None:
+                    for bar in bar_messages:
+                        await self._send_counted(websocket, encoder.encode_bar(bar), bar_key(bar))
+                        frames += 1
+                
+                if frames >= REPLAY_YIELD_EVERY:
+                    frames = 0
+                    await asyncio.sleep(0)
+                
+                # The next step may start a candle whose chunk is still loading.
+                await self.wait_for_candles(symbol_generators)
+            
+            if bars is not None:
+                for bar in bars.finish_all():
+                    await self._send_counted(websocket, encoder.encode_bar(bar), bar_key(bar))
+            
+            await websocket.send(dumps({
+                "status": "completed",
+                "message": "All symbol data has been processed"
+            }))
+        
+        except websockets.exceptions.ConnectionClosed:
+            print(f"Client {client_id} connection closed during replay")
+        except Exception as e:
+            print(f"Error replaying ticks to client {client_id}: {e}")
+            try:
+                await websocket.send(dumps({
+                    "error": f"Error streaming ticks: {str(e)}"
+                }))
+            except:
+                pass
+    
+    async def wait_for_candles(self, symbol_generators):
+        """Wait without blocking the event loop for candle loads the generators' next candles need."""
+        for generator in symbol_generators.values():
+            pending_load = getattr(generator, "pending_load", None)
+            future = pending_load() if pending_load is not None else None
+            if future is not None:
+                await asyncio.wrap_future(future)
+    
+    async def send_ticks(self, client_id):
+        """Send ticks to a specific client based on their subscription."""
+        client = self.clients.get(client_id)
+        if not client:
+            return
+        
+        websocket = client["websocket"]
+        client["job"] = self.scheduler.schedule(client["tick_frequency_ms"] / 1000.0,
+                                                lambda now: self._client_step(client, now))
+        
+        try:
+            await self._drain_send_queue(websocket, client["send_queue"])
+            await websocket.send(dumps({
+                "status": "completed",
+                "message": "All symbol data has been processed"
+            }))
         
         except websockets.exceptions.ConnectionClosed:
             print(f"Client {client_id} connection closed during tick streaming")
+        except SendQueueOverflow:
+            pass
         except Exception as e:
             print(f"Error sending ticks to client {client_id}: {e}")
             try:
-                await websocket.send(json.dumps({
+                await websocket.send(dumps({
                     "error": f"Error streaming ticks: {str(e)}"
                 }))
             except:
                 pass
+        finally:
+            client["job"].cancel()
+    
+    def _client_step(self, client, now):
+        """
+        Produce one round of ticks for a client on a scheduler step.
+        
+        Messages are put on the client's send queue for send_ticks to write,
+        one per symbol or a single array frame for clients that asked for
+        batching, followed by the bar messages of clients that asked for bars.
+        Returns False once the client is done or was disconnected for lagging,
+        so the scheduler drops the job.
+        """
+        if not client.get("active", False):
+            return False
+        
+        send_queue = client["send_queue"]
+        symbol_generators = client["symbol_generators"]
+        override_time = client["override_time"]
+        encoder = client["encoder"]
+        bars = client["bars"]
+        bar_messages = []
+        
+        try:
+            active_symbols = [s for s, g in symbol_generators.items() if g.has_more_data()]
+            
+            if not active_symbols:
+                send_queue.finish()
+                return False
+            
+            loading = set()
+            for symbol in active_symbols:
+                generator = symbol_generators[symbol]
+                if generator.should_advance_candle(now):
+                    # A symbol whose next candles are still loading pauses instead of blocking the event loop.
+                    if generator.pending_load() is not None:
+                        loading.add(symbol)
+                        continue
+                    generator.advance_candle()
+            
+            wall_clock_ms = int(datetime.now().timestamp() * 1000)
+            metrics = self.metrics
+            ticks = []
+            for symbol in active_symbols:
+                generator = symbol_generators[symbol]
+                if symbol in loading:
+                    continue
+                
+                if not generator.has_more_data():
+                    if bars is not None:
+                        bar_messages.append(bars.finish(symbol))
+                    continue
+                
+                if metrics.sample():
+                    start = time.perf_counter()
+                    tick_price = generator.generate_tick()
+                    metrics.generate.observe(time.perf_counter() - start)
+                else:
+                    tick_price = generator.generate_tick()
+                
+                if tick_price is None:
+                    continue
+                
+                metrics.ticks_generated.labels(symbol).inc()
+                
+                if override_time:
+                    timestamp_ms = generator.get_current_timestamp_ms()
+                else:
+                    timestamp_ms = wall_clock_ms
+                
+                ticks.append((symbol, timestamp_ms, tick_price))
+                if bars is not None:
+                    bar_messages.extend(bars.add_tick(symbol, timestamp_ms, tick_price, generator.current_candle_ms,
+                                                      generator.current_candle_volume))
+            
+            if not client["ticks"]:
+                pass
+            elif client["batch"]:
+                symbols = tuple(tick[0] for tick in ticks)
+                if ticks and not send_queue.put(encoder.encode_batch(ticks), symbols):
+                    return False
+            else:
+                for tick in ticks:
+                    if not send_queue.put(encoder.encode(*tick), tick[0]):
+                        return False
+            
+            for bar in bar_messages:
+                if bar is not None and not send_queue.put(encoder.encode_bar(bar), bar_key(bar)):
+                    return False
+        except Exception as e:
+            send_queue.finish(e)
+            return False
+        
+        return True
     
-    async def start(self):
-        """Start the WebSocket server."""
+    async def poll_catalog(self):
+        """Keep the symbol catalog current, rescanning in a thread so subscribes never wait on a scan."""
+        catalog = self.data_loader.catalog
+        while True:
+            await asyncio.sleep(CATALOG_POLL_SECONDS)
+            try:
+                await asyncio.to_thread(catalog.refresh)
+            except Exception as e:
+                print(f"Error refreshing symbol catalog: {e}")
+    
+    def stats(self):
+        """Return a snapshot of client, send queue, scheduler, broadcast and cache statistics."""
+        return {
+            "clients": len(self.clients),
+            "send_queues": {
+                client_id: client["send_queue"].stats()
+                for client_id, client in self.clients.items() if client.get("send_queue") is not None
+            },
+            "scheduler": self.scheduler.stats(),
+            "broadcast": self.broadcaster.stats(),
+            "cache": self.data_loader.cache.stats()
+        }
+    
+    async def start(self, stop_event=None, sock=None, reuse_port=False):
+        """
+        Start the WebSocket server.
+        
+        Args:
+            stop_event: asyncio.Event that shuts the server down when set; runs forever if None
+            sock: Already bound listening socket to serve on instead of host and port
+            reuse_port: Bind with SO_REUSEPORT so several processes can share the port
+        """
         print(f"Starting WebSocket server on ws://{self.host}:{self.port}")
-        async with websockets.serve(self.handle_client, self.host, self.port):
-            await asyncio.Future()
+        scheduler_task = asyncio.create_task(self.scheduler.run())
+        catalog_task = asyncio.create_task(self.poll_catalog())
+        if sock is not None:
+            serve = websockets.serve(self.handle_client, sock=sock, process_request=self.process_http_request)
+        else:
+            serve = websockets.serve(self.handle_client, self.host, self.port, reuse_port=reuse_port,
+                                     process_request=self.process_http_request)
+        try:
+            async with serve:
+                if stop_event is None:
+                    await asyncio.Future()
+                else:
+                    await stop_event.wait()
+        finally:
+            scheduler_task.cancel()
+            catalog_task.cancel()
+            self.profiler.stop()
+            print(f"Scheduler stats: {self.scheduler.stats()}")
@@ -0,0 +1,199 @@
+import asyncio
+import math
+import multiprocessing
+import queue
+import signal
+import socket
+import time
+from multiprocessing import shared_memory
+from candle_cache import CandleCache
+from candle_file import candle_buffer_size, write_candle_buffer, store_from_buffer
+from data_loader import DataLoader
+from preloader import preload_symbols
+from websocket_server import WebSocketServer
+
+
+STATS_INTERVAL_SECONDS = 10
+SHUTDOWN_TIMEOUT_SECONDS = 5
+
+# Shared memory blocks attached by this process, kept alive as long as the
+# candle stores that view them.
+_attached_blocks = []
+
+
+def share_candles(data_dir, processes=None):
+    """
+    Load every available symbol once and copy its candles into shared memory.
+    
+    Args:
+        processes: Size of the process pool parsing the data files, see preload_symbols
+    
+    Returns:
+        (descriptors, blocks): descriptors are (symbol, signature, row counts,
+        block name) tuples to pass to workers, blocks the SharedMemory objects
+        to unlink on shutdown
+    """
+    # A private cache, so the loads made here are neither kept around nor
+    # counted in the stats that forked workers inherit. Every symbol is
+    # shared, so it is unbounded rather than evicting what was just loaded.
+    loader = DataLoader(data_dir, cache=CandleCache(max_bytes=math.inf))
+    descriptors = []
+    blocks = []
+    
+    for symbol, (signature, candles, row_counts) in sorted(preload_symbols(loader, processes=processes).items()):
+        block = shared_memory.SharedMemory(create=True, size=candle_buffer_size(len(candles)))
+        write_candle_buffer(block.buf, candles)
+        blocks.append(block)
+        descriptors.append((symbol, signature, row_counts, block.name))
+    
+    return descriptors, blocks
+
+
+def attach_candles(loader, descriptors):
+    """Put zero-copy stores over the shared candle blocks into a worker's cache."""
+    for symbol, signature, row_counts, block_name in descriptors:
+        block = shared_memory.SharedMemory(name=block_name)
+        _attached_blocks.append(block)
+        loader.add_to_cache(symbol, signature, store_from_buffer(block.buf), row_counts)
+
+
+def run_worker(index, host, port, data_dir, descriptors, stats_queue, sock):
+    """Entry point of a worker process: serve websocket clients until told to stop."""
+    server = WebSocketServer(host, port, data_dir)
+    attach_candles(server.data_loader, descriptors)
+    
+    async def serve():
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop_event.set)
+        
+        async def report_stats():
+            while True:
+                await asyncio.sleep(STATS_INTERVAL_SECONDS)
+                stats_queue.put((index, server.stats()))
+        
+        reporter = asyncio.create_task(report_stats())
+        try:
+            await server.start(stop_event, sock=sock, reuse_port=sock is None)
+        finally:
+            reporter.cancel()
+            stats_queue.put((index, server.stats()))
+    
+    asyncio.run(serve())
+
+
+def aggregate_stats(worker_stats):
+    """Combine the latest stats reported by each worker into one summary."""
+    summary = {
+        "workers": len(worker_stats),
+        "clients": 0,
+        "messages_dropped": 0,
+        "client_lag_max_ms": 0.0,
+        "broadcast_streams": 0,
+        "scheduler_jobs_run": 0,
+        "scheduler_missed_deadlines": 0,
+        "scheduler_lateness_max_ms": 0.0,
+        "cache_hits": 0,
+        "cache_misses": 0
+    }
+    
+    for stats in worker_stats.values():
+        summary["clients"] += stats["clients"]
+        for queue_stats in stats["send_queues"].values():
+            summary["messages_dropped"] += queue_stats["dropped"]
+            summary["client_lag_max_ms"] = max(summary["client_lag_max_ms"], queue_stats["max_lag_ms"])
+        summary["broadcast_streams"] += len(stats["broadcast"])
+        summary["scheduler_jobs_run"] += stats["scheduler"]["jobs_run"]
+        summary["scheduler_missed_deadlines"] += stats["scheduler"]["missed_deadlines"]
+        summary["scheduler_lateness_max_ms"] = max(summary["scheduler_lateness_max_ms"],
+                                                   stats["scheduler"]["lateness_max_ms"])
+        summary["cache_hits"] += stats["cache"]["hits"]
+        summary["cache_misses"] += stats["cache"]["misses"]
+    
+    return summary
+
+
+def run_workers(host, port, workers, data_dir="data", preload_processes=None):
+    """
+    Serve on one port from several worker processes.
+    
+    Candle data is loaded once in this process and shared with the workers
+    through shared memory. Workers bind the port with SO_REUSEPORT where the
+    platform supports it, so the kernel spreads connections across them;
+    otherwise they accept on one listening socket inherited from this process.
+    The data files are parsed in parallel by a pool of preload_processes
+    processes before the workers start.
+    """
+    start = time.perf_counter()
+    descriptors, blocks = share_candles(data_dir, preload_processes)
+    shared_bytes = sum(block.size for block in blocks)
+    print(f"Shared {len(descriptors)} symbols ({shared_bytes / 1024 / 1024:.1f} MB) "
+          f"in {time.perf_counter() - start:.2f}s")
+    
+    sock = None
+    if not hasattr(socket, "SO_REUSEPORT"):
+        sock = socket.create_server((host, port))
+    
+    stats_queue = multiprocessing.Queue()
+    processes = []
+    worker_stats = {}
+    stopping = False
+    
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    
+    previous_handlers = {signum: signal.signal(signum, request_stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+    
+    try:
+        for index in range(workers):
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(index, host, port, data_dir, descriptors, stats_queue, sock),
+                name=f"tick-worker-{index}"
+            )
+            process.start()
+            processes.append(process)
+        print(f"Started {workers} workers on ws://{host}:{port}")
+        
+        last_report = time.monotonic()
+        while not stopping and any(process.is_alive() for process in processes):
+            try:
+                index, stats = stats_queue.get(timeout=1)
+                worker_stats[index] = stats
+            except queue.Empty:
+                pass
+            
+            if time.monotonic() - last_report >= STATS_INTERVAL_SECONDS and worker_stats:
+                print(f"Stats: {aggregate_stats(worker_stats)}")
+                last_report = time.monotonic()
+    finally:
+        print("Stopping workers...")
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT_SECONDS
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        
+        while True:
+            try:
+                index, stats = stats_queue.get_nowait()
+                worker_stats[index] = stats
+            except queue.Empty:
+                break
+        if worker_stats:
+            print(f"Final stats: {aggregate_stats(worker_stats)}")
+        
+        for block in blocks:
+            block.close()
+            block.unlink()
+        if sock is not None:
+            sock.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)